@@ -6,13 +6,29 @@ from datetime import datetime
 import google.generativeai as genai
 import textwrap
 import re
-import gspread
-from gspread_dataframe import get_as_dataframe
-from oauth2client.service_account import ServiceAccountCredentials
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+from breakfast import store as derived
+from breakfast.basket import Scenario, basket_vectors, build_price_matrix, evaluate_baskets, load_profiles
+from breakfast.catalog import get_catalog
+from breakfast.data import latest_etl, load_dataset
+from breakfast.export import FORMATS, export_bytes
+from breakfast.forecast import DEFAULT_HORIZON, MAX_HORIZON, PRICE_DEPENDENCIES
+from breakfast.pricing import METHODS, estimate_prices
+from breakfast.recipes import RecipeIndex, load_recipes, recipe_markdown
+from breakfast.scheduler import SectionScheduler
+from breakfast.sessions import registry, shared_ids
+from breakfast.tables import PAGE_SIZE, build_wide_tables, n_pages, paginate
+from breakfast.versioning import bus, fingerprint
 
 st.set_page_config(page_title="Previsão dos Itens do Café da Manhã",page_icon="📊",layout="wide")
-st.sidebar.markdown(
-    """
+intro = st.sidebar.empty()
+horizon = st.sidebar.slider("📅 Horizonte de previsão (meses)",1,MAX_HORIZON,DEFAULT_HORIZON,
+                            help="Meses além da previsão do modelo são estendidos pela tendência e sazonalidade do item.")
+intro.markdown(
+    f"""
     <h3 style='text-align: center;'>📈 Por que criei este projeto?</h3>
     <p style='text-align: justify;'>
     Com os aumentos repentinos e expressivos nos preços do <strong>café</strong> e dos <strong>ovos</strong>, comecei a me perguntar:<br>
@@ -22,7 +38,7 @@ st.sidebar.markdown(
     <ul style='text-align: left;'>
       <li>Investigar a variação dos preços desses itens;</li>
       <li>Estimar quais produtos tendem a sofrer aumento nos próximos meses;</li>
-      <li>Prever <strong>quanto esses preços podem subir nos próximos 6 meses</strong>.</li>
+      <li>Prever <strong>quanto esses preços podem subir nos próximos {horizon} meses</strong>.</li>
     </ul>
     <p style='text-align: justify;'>A proposta é fornecer uma visão clara e acessível sobre a inflação do café da manhã — combinando dados, inteligência artificial e visualizações interativas.</p>
     """,
@@ -44,108 +60,19 @@ def explain_color(color_code, desc):
     )
 
 
-def return_measurament_items():
-    
-    return {
-    "aveia":        "200g",
-    "banana":       "1kg",
-    "cafe":         "250g",
-    "cuscuz":       "500g",
-    "iogurte":      "170g",
-    "leite":        "1L",
-    "mamao":        "1kg",
-    "manteiga":     "200g",
-    "margarina":    "250g",
-    "ovos":         "30 un",
-    "pao frances":  "500g",
-    "queijo":       "200g"
-}
-
-def return_pretty_item(item,inverse=False):
-    
-    map_dict = {
-        "aveia":        "🌾 Aveia",
-        "banana":       "🍌 Banana",
-        "cafe":         "☕ Café",
-        "cuscuz":       "🍚 Cuscuz",
-        "iogurte":      "🥛 Iogurte",
-        "leite":        "🍼 Leite",
-        "mamao":        "🍈 Mamão",
-        "manteiga":     "🧈 Manteiga",
-        "margarina":    "🧈 Margarina",
-        "ovos":         "🥚 Ovos",
-        "pao frances":  "🥖 Pão Francês",
-        "queijo":       "🧀 Queijo"
-        }
-    
-    if inverse:
-        display_to_key = {v: k for k, v in map_dict.items()}
-        
-        return display_to_key.get(item,None)
-    
-    return map_dict.get(item,None)
-
 # Important Functions
-@st.cache_resource
+@st.cache_resource(ttl=3600)
 def retrieve_data():
-    service_account_info = st.secrets["gspread_service_account"]
-
-    # Escopos de acesso
-    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-
-    # Autenticação
-    creds = ServiceAccountCredentials.from_json_keyfile_dict(service_account_info, scope)
-    client = gspread.authorize(creds)
-
-    # Abrir a planilha pelo nome
-    sheet = client.open("breakfast_forecast")
-
-    # Selecionar a aba desejada (por nome ou posição)
-    pages = ["breakfast_id","breakfast_timeseries","seasonality_forecast","series_forecast","supermarket_items"]
-    dataset = {}
-
-    for page in pages:
-        worksheet = sheet.worksheet(page)
-        df = get_as_dataframe(worksheet, evaluate_formulas=True)
-        dataset[page] = df
-        
+    dataset = load_dataset(st.secrets)
+    # A new version evicts the caches that depend on the sheets that changed
+    bus.publish(fingerprint(dataset))
+    derived.materialize(dataset,get_catalog(dataset["breakfast_id"]))
     return dataset
 
-def return_stats_df(dataset):
-    supermarket_df = dataset["supermarket_items"]
-    
-    items = supermarket_df["item"].unique()
-    
-    stats = {"Item":[],"Medida":[],"Preço":[],"Preço Previsão":[],"Diferença %":[],"Diferença R$":[],"Nº Itens Estudados":[],"Inflação Média Próximos 6 Meses":[]}
-    
-    measures = return_measurament_items()
-    
-    for item in items:
-        series_forecast = get_price_df(dataset,item)
-        supermarket_df = dataset["supermarket_items"]
-        supermarket_df = supermarket_df[supermarket_df["item"]==item]
-        
-        
-        price_rn = get_mean_price(item,dataset,supermarket=None)
-        price_future = series_forecast["price"].iloc[-1]
-        mean_inflation = np.mean(series_forecast["y"].iloc[-6:].values)
-        
-        stats["Item"].append(return_pretty_item(item))
-        stats["Medida"].append(measures[item])
-        stats["Preço"].append(get_mean_price(item,dataset,supermarket=None))
-        stats["Preço Previsão"].append(series_forecast["price"].iloc[-1] )
-        stats["Diferença R$"].append(price_future-price_rn)
-        stats["Diferença %"].append(price_future*100/price_rn -100)
-        stats["Nº Itens Estudados"].append(len(supermarket_df))
-        stats["Inflação Média Próximos 6 Meses"].append(mean_inflation)
-        
-        
-    return pd.DataFrame(stats)
-
 def plot_seasonality(season_forecast,item,title=""):
     fig = go.Figure([
     go.Scatter(
-        name=f'Tendencia {return_pretty_item(item)}',
+        name=f'Tendencia {catalog.pretty(item)}',
         x=season_forecast['ds'],
         y=season_forecast['season'],
         mode='lines',
@@ -185,62 +112,6 @@ def plot_seasonality(season_forecast,item,title=""):
 
     return fig
 
-def get_mean_price(item,dataset,supermarket=None):
-    
-    supermarket_df = dataset["supermarket_items"]
-
-    dates = supermarket_df["ETL"].unique()
-    date = dates.max()
-
-    item_df = supermarket_df[(supermarket_df["item"]==item) & (supermarket_df["ETL"]==date)]
-    if supermarket:
-        try:
-            item_df = item_df[item_df["supermarket"]==supermarket]
-        except Exception as e:
-            print("Error {e}")
-    
-    
-    return item_df["price"].mean()
-
-def get_price_df(dataset,item):
-    
-    id_data = dataset["breakfast_id"]
-
-    id = id_data[id_data["item"]==item]["id"].values[0]
-
-    series_forecast = dataset["series_forecast"]
-    series_forecast = series_forecast[series_forecast["id"]==id].copy()
-    series_forecast["ds"] = pd.to_datetime(series_forecast["ds"])
-    
-    supermarket_df = dataset["supermarket_items"]
-
-    dates = supermarket_df["ETL"].unique()
-    date = dates.max()
-
-    past_data = series_forecast[series_forecast["ds"]<date].reset_index(drop=True)
-    future_data = series_forecast[series_forecast["ds"]>=date].reset_index(drop=True)
-
-    past_data.loc[past_data.index[-1], 'price'] = get_mean_price(item,dataset)
-
-    present_index = len(past_data)
-
-    for i in range(len(past_data) - 2, -1, -1):
-        past_data.loc[i, 'price'] = past_data.loc[i + 1, 'price'] / (1 + past_data.loc[i + 1, 'y']/100)
-
-    past_data = pd.concat([past_data,future_data]).reset_index(drop=True)
-
-    for i in range(present_index,len(past_data)):
-        past_data.loc[i,"price"] = past_data.loc[i - 1, 'price'] * (1 + past_data.loc[i - 1, 'y']/100)
-
-    past_data.loc[past_data.index[present_index-1], 'price_lower'] = get_mean_price(item,dataset)
-    past_data.loc[past_data.index[present_index-1], 'price_upper'] = get_mean_price(item,dataset)
-
-    for i in range(present_index,len(past_data)):
-        past_data.loc[i,"price_lower"] = past_data.loc[i - 1, 'price_lower'] * (1 + past_data.loc[i - 1, 'y_lower']/100)
-        past_data.loc[i,"price_upper"] = past_data.loc[i - 1, 'price_upper'] * (1 + past_data.loc[i - 1, 'y_upper']/100)
-    
-    return past_data
- 
 def create_forecast_plot(series_forecasts, items, metric,title=""):  
     """
     Create a plot for multiple forecast series.
@@ -253,10 +124,6 @@ def create_forecast_plot(series_forecasts, items, metric,title=""):
     Returns:
     - Plotly Figure with multiple traces
     """
-    # Ensure datetime conversion for all series
-    for series in series_forecasts:
-        series['ds'] = pd.to_datetime(series['ds'])
-    
     # Create the plot
     today_date = datetime.today()
     
@@ -447,296 +314,499 @@ def create_forecast_plot_solo(serie_forecast, item, metric,title="",tendency = F
     )
     
     return fig
-@st.cache_resource
-def call_gemini(prompt):
+def create_basket_plot(basket_cost,title=""):
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter(
+        x=basket_cost.dates, 
+        y=basket_cost.cost[0], 
+        mode='lines+markers', 
+        name='Minha Cesta',
+        line=dict(color="#3182bd")
+    ))
+    
+    fig.add_trace(go.Scatter(
+            name='Limite Superior',
+            x=basket_cost.dates,
+            y=basket_cost.cost_upper[0],
+            mode='lines',
+            marker=dict(color="#444"),
+            line=dict(width=0),
+            showlegend=False
+        ))
+    
+    fig.add_trace(go.Scatter(
+            name='Limite inferior',
+            x=basket_cost.dates,
+            y=basket_cost.cost_lower[0],
+            marker=dict(color="#444"),
+            line=dict(width=0),
+            mode='lines',
+            fillcolor='rgba(68, 68, 68, 0.3)',
+            fill='tonexty',
+            showlegend=False
+        ))
+    
+    fig.update_layout(
+        title=title, 
+        title_font=dict(size=24),  # Increase title font size
+        autosize=True,  # Make the plot responsive
+        margin=dict(l=10, r=10, t=40, b=20),  # Adjust margins for a tighter layout
+        showlegend=False,
+        hovermode="x",
+        height=300,  # Set a fixed height to avoid it being too tall
+    )
+    
+    return fig
+
+@st.cache_resource(max_entries=16,show_spinner=False)
+def call_gemini(prompt,version):
     genai.configure(api_key=st.secrets["api_keys"]["genimi_api"])
     model = genai.GenerativeModel('gemini-2.0-flash')
 
     response = model.generate_content(prompt)
     return format_output_llm(response.text)
 
+@st.cache_resource(max_entries=512,show_spinner=False)
+def item_price_df(version,item,horizon,_dataset):
+    return derived.price_series(_dataset,item,horizon)
+
+@st.cache_resource(max_entries=32,show_spinner=False)
+def wide_tables(version,items,horizon,_dataset,_catalog):
+    return build_wide_tables({item: item_price_df(version,item,horizon,_dataset) for item in items},_catalog)
+
+@st.cache_resource(max_entries=4,show_spinner=False)
+def price_matrix(version,horizon,_dataset,_catalog):
+    return build_price_matrix(_dataset,_catalog,horizon=horizon)
+
+@st.cache_resource(max_entries=4,show_spinner=False)
+def recipe_index(version,horizon,_dataset,_catalog):
+    return RecipeIndex(load_recipes(),price_matrix(version,horizon,_dataset,_catalog))
+
+@st.cache_data(max_entries=24,show_spinner=False)
+def stats_table(version,horizon,_dataset,_catalog):
+    return derived.round_stats(derived.stats(_dataset,_catalog,horizon),horizon)
+
+@st.cache_data(max_entries=24,show_spinner=False)
+def split_table(version,horizon,_dataset,_catalog):
+    return derived.price_split(_dataset,_catalog,horizon)
+
+def clear_on_change(function,depends_on=None):
+    bus.subscribe(f"streamlit.{function.__name__}",lambda old,new: function.clear(),depends_on)
+
+for function in [item_price_df,wide_tables,price_matrix,recipe_index,stats_table,split_table,call_gemini]:
+    clear_on_change(function,PRICE_DEPENDENCIES)
+
 def format_output_llm(text):
   text = text.replace('•', '  *')
   return textwrap.indent(text, '> ', predicate=lambda _: True)
 # Body of the Page
 st.title("☕ Quanto Custa o Café da Manhã?")
 
+LOADING = "⏳ Carregando..."
+
 #bases = ["breakfast_id","breakfast_timeseries","seasonality_forecast","series_forecast","supermarket_items"]
 
 def get_dataset():
-    if "dataset" not in st.session_state:
-        st.session_state["dataset"] = retrieve_data()
+    # Always refreshed from the shared cache, so sessions pick up new ETLs. Only a
+    # reference is kept in the session (shared by every session, never copied)
+    st.session_state["dataset"] = retrieve_data()
     return st.session_state["dataset"]
 
 dataset = get_dataset()
+catalog = get_catalog(dataset["breakfast_id"])
+version = fingerprint(dataset)
+price_version = version.scope(PRICE_DEPENDENCIES)
+
+ctx = get_script_run_ctx()
+session = registry.touch(ctx.session_id,ctx.session_state,shared_ids(dataset)) if ctx is not None else None
 
 #@st.fragment()
-def info_time_series_general():
+def paged_dataframe(df,key):
+    
+    if len(df) > PAGE_SIZE:
+        page = st.number_input(f"Página (de {n_pages(df)})",min_value=1,max_value=n_pages(df),value=1,key=key)
+        df = paginate(df,page)
+    st.dataframe(df,hide_index=True)
+
+def general_data(item_choice):
+    forecasts = [item_price_df(price_version,item,horizon,dataset) for item in item_choice]
+    inflation_table, price_table = wide_tables(price_version,tuple(item_choice),horizon,dataset,catalog)
+    
+    inflation_fig = create_forecast_plot(forecasts,item_choice,"y","Inflação %")
+    price_fig = create_forecast_plot(forecasts,item_choice,"price","Preço R$")
+    return inflation_fig, price_fig, inflation_table, price_table
+
+def info_time_series_general(scheduler):
         
-    items_df = dataset["breakfast_id"]
-    breakfast_items = [return_pretty_item(item) for item in items_df["item"].values]
+    breakfast_items = list(catalog.displays)
     
     placeholder="Escolha os itens para a análise"
     
-    forecasts = []
-    measuraments = return_measurament_items()
     with st.container(border=True):
-        item_choice = st.multiselect(placeholder, breakfast_items,default=[return_pretty_item(item) for item in['aveia', 'banana','cafe','ovos','leite']] )
-        info_data = pd.DataFrame()
+        item_choice = st.multiselect(placeholder, breakfast_items,default=list(catalog.to_display(['aveia', 'banana','cafe','ovos','leite'])))
         
-        item_choice =  [return_pretty_item(item,inverse=True) for item in item_choice]
+        item_choice = list(catalog.to_keys(item_choice))
         
-        column_names_dict = [{"ds":"Data"},{"ds":"Data"}]
+        scheduler.submit("general",general_data,item_choice)
+        section = st.empty()
+        section.caption(LOADING)
+    
+    def render():
+        if len(item_choice)==0:
+            section.empty()
+            return
         
-        porcoes = ""
-        for item in item_choice:
+        inflation_fig, price_fig, inflation_table, price_table = scheduler.result("general")
+        porcoes = ",".join(f" {catalog.pretty(item)} {catalog.unit(item)}" for item in item_choice)
         
-            id = items_df[items_df["item"]==item]["id"].values[0]
-            
-            series_forecast = get_price_df(dataset,item)
-            season_forecast = dataset["seasonality_forecast"]
-            season_forecast = season_forecast[season_forecast["id"]==id]
-            
-            series_forecast["ds"] = series_forecast["ds"].dt.strftime('%Y-%m')
-            series_forecast["y"] = series_forecast["y"].round(2)
-            series_forecast["price"] = series_forecast["price"].round(2)
-            
-            if "ds" not in info_data.columns:
-                info_data["ds"] = series_forecast["ds"]
-            
-            info_data[f"{item}_inflation"] = series_forecast["y"]
-            info_data[f"{item}_price"]     = series_forecast["price"]
-            column_names_dict[0][f"{item}_inflation"] = return_pretty_item(item)
-            column_names_dict[1][f"{item}_price"]     = return_pretty_item(item)
-            
-            porcoes += f" {return_pretty_item(item)} {measuraments[item]},"
-            forecasts.append(series_forecast)
-            
-        if len(item_choice)>0:
-            porcoes = porcoes[::-1].replace(',', '.', 1)[::-1]
-            st.caption(f"Foram considerados as seguintes porções:{porcoes}")
-            #"rgba(52, 73, 94, 0.25)
-            #rgba(243, 156, 18, 0.25)
-            # explain_color("rgba(52, 73, 94, 0.25)","Representa os dados do passado.")
-            # explain_color("rgba(243, 156, 18, 0.25)","Representa a previsão do futuro.")
+        with section.container():
+            st.caption(f"Foram considerados as seguintes porções:{porcoes}.")
             col = st.columns(2)
             with col[0]:
                 explain_color("rgba(52, 73, 94, 0.25)","Representa os dados do passado.")
                 graph,data = st.tabs(["Gráfico","Dados"])
                 with graph:
-                    fig = create_forecast_plot(forecasts,item_choice,"y","Inflação %")
-                    st.plotly_chart(fig,use_container_width=True)
+                    st.plotly_chart(inflation_fig,use_container_width=True)
                 with data:
                     st.markdown(f"<h4 style='text-align: center;'>Inflação %</h4>", unsafe_allow_html=True)
-                    
-                    st.dataframe(info_data[["ds"]+[col for col in info_data.columns if "inflation" in col]].rename(columns=column_names_dict[0]),hide_index=True)
+                    paged_dataframe(inflation_table,"inflation_page")
             with col[1]:
                 explain_color("rgba(243, 156, 18, 0.25)","Representa a previsão do futuro.")
                 graph,data = st.tabs(["Gráfico","Dados"])
                 with graph:
-                    fig = create_forecast_plot(forecasts,item_choice,"price","Preço R$")
-                    st.plotly_chart(fig,use_container_width=True)
+                    st.plotly_chart(price_fig,use_container_width=True)
                 with data:
                     st.markdown(f"<h4 style='text-align: center;'>Preço R$</h4>", unsafe_allow_html=True)
-                    st.dataframe(info_data[["ds"]+[col for col in info_data.columns if "price" in col]].rename(columns=column_names_dict[1]),hide_index=True)
+                    paged_dataframe(price_table,"price_page")
+    
+    return render
 
-def info_time_series_solo():
+def solo_data(item,id):
+    series_forecast = derived.price_series(dataset,item,horizon)
+    series_forecast["ds"] = pd.to_datetime(series_forecast["ds"])
+    series_forecast["ds"] = series_forecast["ds"].dt.strftime('%Y-%m')
+    series_forecast[["y", "y_lower", "y_upper"]] = series_forecast[["y", "y_lower", "y_upper"]].round(2)
+    series_forecast[["price", "price_lower", "price_upper"]] = series_forecast[["price", "price_lower", "price_upper"]].round(2)
+    series_forecast[["trend", "trend_lower", "trend_upper"]] = series_forecast[["trend", "trend_lower", "trend_upper"]].round(2)
+    
+    series_forecast.iloc[:-(horizon+1), series_forecast.columns.get_indexer(['y_lower', 'y_upper'])] = np.nan
+    series_forecast.iloc[:-(horizon+1), series_forecast.columns.get_indexer(['trend_lower', 'trend_upper'])] = np.nan
+    
+    season_forecast = derived.seasonality(dataset,id)
+    season_forecast["ds"] = pd.to_datetime(season_forecast["ds"])
+    season_forecast["season"] = season_forecast["season"].round(2)
+    
+    figures = {
+        "y": create_forecast_plot_solo(series_forecast,item,"y","Inflação %",True),
+        "price": create_forecast_plot_solo(series_forecast,item,"price","Preço R$"),
+        "season": plot_seasonality(season_forecast,item,"Sazonalidade % (Inflação)"),
+    }
+    return series_forecast, season_forecast, figures
+
+def info_time_series_solo(scheduler):
         
-    items_df = dataset["breakfast_id"]
-    breakfast_items = items_df["item"].values
+    breakfast_items = list(catalog.displays)
     
     placeholder="Escolha o item para a análise"
     
     with st.container(border=True):
-        breakfast_items = [return_pretty_item(item) for item in breakfast_items]
         item = st.selectbox(placeholder, breakfast_items)
         
-        item = return_pretty_item(item,inverse=True)
-        
-        id = items_df[items_df["item"]==item]["id"].values[0]
-        
-        st.markdown(f"<h3 style='text-align: center;'>Informações Detalhadas sobre {return_pretty_item(item)}</h3>", unsafe_allow_html=True)
+        item = catalog.key(item)
         
-        series_forecast = get_price_df(dataset,item)
-        series_forecast["ds"] = pd.to_datetime(series_forecast["ds"])
-        series_forecast["ds"] = series_forecast["ds"].dt.strftime('%Y-%m')
-        series_forecast[["y", "y_lower", "y_upper"]] = series_forecast[["y", "y_lower", "y_upper"]].round(2)
-        series_forecast[["price", "price_lower", "price_upper"]] = series_forecast[["price", "price_lower", "price_upper"]].round(2)
-        series_forecast[["trend", "trend_lower", "trend_upper"]] = series_forecast[["trend", "trend_lower", "trend_upper"]].round(2)
+        id = catalog.id(item)
         
-        series_forecast.iloc[:-7, series_forecast.columns.get_indexer(['y_lower', 'y_upper'])] = np.nan
-        series_forecast.iloc[:-7, series_forecast.columns.get_indexer(['trend_lower', 'trend_upper'])] = np.nan
+        st.markdown(f"<h3 style='text-align: center;'>Informações Detalhadas sobre {catalog.pretty(item)}</h3>", unsafe_allow_html=True)
         
-        season_forecast = dataset["seasonality_forecast"]
-        season_forecast = season_forecast.reset_index()
-        season_forecast = season_forecast[season_forecast["id"]==id].copy()
-        season_forecast["ds"] = pd.to_datetime(season_forecast["ds"])
-        season_forecast["season"] = season_forecast["season"].round(2)
+        scheduler.submit("solo",solo_data,item,id)
+        section = st.empty()
+        section.caption(LOADING)
+    
+    def render():
+        series_forecast, season_forecast, figures = scheduler.result("solo")
         
-        supermarket_df = dataset["supermarket_items"]
-        supermarket_df = supermarket_df[supermarket_df["item"]==item]
+        estimates = estimate_prices(dataset)
+        supermarket_df = estimates.item_rows(item)
         
-        dates = supermarket_df["ETL"].unique()
-        date = dates.max()
+        date = latest_etl(dataset)
         
-        col = st.columns(2)
-        with col[0]:
-            explain_color("rgba(52, 73, 94, 0.25)","Representa os dados do passado.")
-            graph,data = st.tabs(["Gráfico","Dados"])
-            with graph:
-                fig = create_forecast_plot_solo(series_forecast.copy(),item,"y","Inflação %",True)
-                st.plotly_chart(fig,use_container_width=True)
-            with data:
-                st.dataframe(series_forecast[["ds", "y","y_lower","y_upper","trend"]]
-                             .rename(columns={"ds": "Data", "y": "Inflação %",
-                                              "y_lower":"Limite Inferior",
-                                              "y_upper":"Limite Superior",
-                                              "trend":"Tendência"}),hide_index=True)
+        with section.container():
+            col = st.columns(2)
+            with col[0]:
+                explain_color("rgba(52, 73, 94, 0.25)","Representa os dados do passado.")
+                graph,data = st.tabs(["Gráfico","Dados"])
+                with graph:
+                    st.plotly_chart(figures["y"],use_container_width=True)
+                with data:
+                    st.dataframe(series_forecast[["ds", "y","y_lower","y_upper","trend"]]
+                                 .rename(columns={"ds": "Data", "y": "Inflação %",
+                                                  "y_lower":"Limite Inferior",
+                                                  "y_upper":"Limite Superior",
+                                                  "trend":"Tendência"}),hide_index=True)
             
                 
-        with col[1]:
-            explain_color("rgba(243, 156, 18, 0.25)","Representa a previsão do futuro.")
-            graph,data = st.tabs(["Gráfico","Dados"])
-            with graph:
-                fig = create_forecast_plot_solo(series_forecast.copy(),item,"price","Preço R$")
-                st.plotly_chart(fig,use_container_width=True)
-            with data:
-                st.dataframe(series_forecast[["ds", "price","price_lower","price_upper"]]
-                             .rename(columns={"ds": "Data", "price": "Preço R$",
-                                              "price_lower":"Limite Inferior",
-                                              "price_upper":"Limite Superior"}),hide_index=True)
-        col = st.columns(2)
+            with col[1]:
+                explain_color("rgba(243, 156, 18, 0.25)","Representa a previsão do futuro.")
+                graph,data = st.tabs(["Gráfico","Dados"])
+                with graph:
+                    st.plotly_chart(figures["price"],use_container_width=True)
+                with data:
+                    st.dataframe(series_forecast[["ds", "price","price_lower","price_upper"]]
+                                 .rename(columns={"ds": "Data", "price": "Preço R$",
+                                                  "price_lower":"Limite Inferior",
+                                                  "price_upper":"Limite Superior"}),hide_index=True)
+            col = st.columns(2)
         
-        # with col[0]:
-        #     graph,data = st.tabs(["Gráfico","Dados"])
-        #     #st.markdown(f"<h6 style='text-align: center;'>Tendência</h6>", unsafe_allow_html=True)
-        #     with graph:
-        #         fig = create_forecast_plot_solo(series_forecast.copy(),item,"trend","Tendência %")
-        #         st.plotly_chart(fig,use_container_width=True)
-        #     with data:
-        #         st.dataframe(series_forecast[["ds", "trend","trend_lower","trend_upper"]]
-        #                      .rename(columns={"ds": "Data", "trend": "Tendência",
-        #                                       "trend_lower":"Limite Inferior",
-        #                                       "trend_upper":"Limite Superior"}))
-        with col[0]:
-            #st.markdown(f"<h6 style='text-align: center;'>Sazonalidade</h6>", unsafe_allow_html=True)
+            # with col[0]:
+            #     graph,data = st.tabs(["Gráfico","Dados"])
+            #     #st.markdown(f"<h6 style='text-align: center;'>Tendência</h6>", unsafe_allow_html=True)
+            #     with graph:
+            #         fig = create_forecast_plot_solo(series_forecast.copy(),item,"trend","Tendência %")
+            #         st.plotly_chart(fig,use_container_width=True)
+            #     with data:
+            #         st.dataframe(series_forecast[["ds", "trend","trend_lower","trend_upper"]]
+            #                      .rename(columns={"ds": "Data", "trend": "Tendência",
+            #                                       "trend_lower":"Limite Inferior",
+            #                                       "trend_upper":"Limite Superior"}))
+            with col[0]:
+                #st.markdown(f"<h6 style='text-align: center;'>Sazonalidade</h6>", unsafe_allow_html=True)
             
-            graph,data = st.tabs(["Gráfico","Dados"])
-            with graph:
-                fig = plot_seasonality(season_forecast,item,"Sazonalidade % (Inflação)")
-                st.plotly_chart(fig,use_container_width=True)
-            with data:
-                season_forecast["ds"] = season_forecast["ds"].dt.strftime('%m-%d')
-                st.dataframe(season_forecast[["ds", "season"]]
-                             .rename(columns={"ds": "Data", "season": "Sazonalidade %"}),hide_index=True)
-        with col[1]:
-            #st.markdown(f"<h6 style='text-align: center;'>informações Sobre Precificação</h6>", unsafe_allow_html=True)
-            graph,data = st.tabs(["Resumo","Dados"])
-            with graph:
-                measuraments = return_measurament_items()
-                st.caption(f"Foram considerados {measuraments[item]} do item {return_pretty_item(item)} para a análise.")
-                col = st.columns(2)    
-                price_rn = get_mean_price(item,dataset)
-                future_price = series_forecast["price"].iloc[-1] 
+                graph,data = st.tabs(["Gráfico","Dados"])
+                with graph:
+                    st.plotly_chart(figures["season"],use_container_width=True)
+                with data:
+                    season_forecast["ds"] = season_forecast["ds"].dt.strftime('%m-%d')
+                    st.dataframe(season_forecast[["ds", "season"]]
+                                 .rename(columns={"ds": "Data", "season": "Sazonalidade %"}),hide_index=True)
+            with col[1]:
+                #st.markdown(f"<h6 style='text-align: center;'>informações Sobre Precificação</h6>", unsafe_allow_html=True)
+                graph,data = st.tabs(["Resumo","Dados"])
+                with graph:
+                    st.caption(f"Foram considerados {catalog.unit(item)} do item {catalog.pretty(item)} para a análise.")
+                    col = st.columns(2)    
+                    price_rn = estimates.price(item)
+                    future_price = series_forecast["price"].iloc[-1] 
             
-                with col[0]:
-                    st.metric(label='Preço Médio (Atual)', value=f"R$ {round(price_rn, 2):,.2f}")
-                    st.metric(label='Variação Próximos 6 meses (Estimativa)', value=f"R$ {round(future_price - price_rn, 2):,.2f}")    
+                    with col[0]:
+                        st.metric(label=f'Preço Atual ({METHODS[estimates.method]})', value=f"R$ {round(price_rn, 2):,.2f}")
+                        st.metric(label=f'Variação Próximos {horizon} meses (Estimativa)', value=f"R$ {round(future_price - price_rn, 2):,.2f}")    
 
-                    change = future_price*100/price_rn -100
-                    st.metric(label='Mudança Percentual (Estimativa)', value=f"{round(change, 2):,.2f}%") 
+                        change = future_price*100/price_rn -100
+                        st.metric(label='Mudança Percentual (Estimativa)', value=f"{round(change, 2):,.2f}%") 
                     
-                    st.metric(label = "Cidades Consideradas",value="Recife")
-                with col[1]:
-                    st.metric(label='Preço Futuro (Estimativa)', value=f"R$ {round(future_price, 2):,.2f}")
-                    st.metric(label='Data de Coleta', value=date) 
-
-                    n_items = len(supermarket_df)
-                    n_supermarkets = len(supermarket_df["supermarket"].unique())
+                        st.metric(label = "Cidades Consideradas",value="Recife")
+                    with col[1]:
+                        st.metric(label='Preço Futuro (Estimativa)', value=f"R$ {round(future_price, 2):,.2f}")
+                        st.metric(label='Data de Coleta', value=date) 
+
+                        n_items = len(supermarket_df)
+                        n_rejected = int(supermarket_df["rejected"].sum())
+                        n_supermarkets = len(supermarket_df["supermarket"].unique())
                     
-                    st.metric(label='Nº Items Analisados', value=n_items) 
-                    st.metric(label='Nº Supermecados Considerados', value=n_supermarkets) 
+                        st.metric(label='Nº Items Analisados', value=n_items) 
+                        st.metric(label='Nº Items Descartados (Outliers)', value=n_rejected) 
+                        st.metric(label='Nº Supermecados Considerados', value=n_supermarkets) 
                     
-            with data:
-                st.dataframe(supermarket_df[["price","name","supermarket"]]
-                             .rename(columns={"price": "Preço", "name": "Nome","supermarket":"Supermercado"}),hide_index=True)
-
-def general_info_all():
-    
+                with data:
+                    st.caption(f"Preços convertidos para {catalog.unit(item)} quando a medida aparece no nome do produto. Itens descartados não entram na estimativa.")
+                    st.dataframe(supermarket_df[["price","unit_price","name","supermarket","rejected"]]
+                                 .rename(columns={"price": "Preço", "unit_price": f"Preço ({catalog.unit(item)})", "name": "Nome",
+                                                  "supermarket":"Supermercado", "rejected":"Descartado"}),hide_index=True)
     
-    stats_df = return_stats_df(dataset)
-    round_list = ["Preço","Preço Previsão","Diferença %","Diferença R$","Inflação Média Próximos 6 Meses"]
-    stats_df[round_list] = stats_df[round_list].round(2)
+    return render
+
+def info_basket(scheduler):
     
-    df_up = stats_df[stats_df["Diferença R$"]>=0]
-    df_down = stats_df[stats_df["Diferença R$"]<0]
+    matrix = scheduler.result("price_matrix")
+    profiles = load_profiles()
     
     with st.container(border=True):
-        st.markdown(f"<h3 style='text-align: center;'>📊 Estatísticas</h3>", unsafe_allow_html=True)
-        tab = st.tabs(["Resumo","Dados"])
-        with tab[0]:
-            col = st.columns(2)
+        col = st.columns([2,3])
+        with col[0]:
+            profile = st.selectbox("Perfil de consumo", list(profiles))
+            quantities_df = pd.DataFrame({
+                "Item": np.asarray(catalog.to_display(matrix.items)),
+                "Medida": np.asarray(catalog.to_units(matrix.items)),
+                "Quantidade": basket_vectors([profiles[profile]],matrix.items)[0],
+            })
+            quantities_df = st.data_editor(quantities_df,disabled=["Item","Medida"],hide_index=True,key=f"basket_{profile}",
+                                           column_config={"Quantidade": st.column_config.NumberColumn(min_value=0.0,step=0.5)})
             
-            with col[0]:
-                with st.container(border=True):
-                    st.markdown(f"<h5 style='text-align: center;'>Itens em Baixa 📉</h5>", unsafe_allow_html=True)
-                    st.dataframe(
-                                df_down[["Item", "Preço","Preço Previsão","Diferença R$"]]
-                                .rename(columns={"Diferença R$": "Diminuição"})
-                                .sort_values('Diminuição', ascending=True),
-                                hide_index=True
-                                )
-            with col[1]:
-                with st.container(border=True):
-                    st.markdown(f"<h5 style='text-align: center;'>Itens em Alta 📈</h5>", unsafe_allow_html=True)
-                    st.dataframe(
-                                df_up[["Item", "Preço","Preço Previsão", "Diferença R$"]]
-                                .rename(columns={"Diferença R$": "Aumento"})
-                                .sort_values('Aumento', ascending=False),
-                                hide_index=True
-                                )
-                
-        with tab[1]:
-            st.dataframe(stats_df,hide_index=True)
+            scenario_item = st.selectbox("Cenário: item com inflação alterada", list(catalog.displays))
+            shock = st.slider("Inflação adicional até o fim do horizonte (%)", -50, 50, 0)
+        
+        # Row 0 is the edited basket, the others are the predefined profiles
+        quantities = np.vstack([quantities_df["Quantidade"].fillna(0).to_numpy(dtype=float),
+                                basket_vectors(list(profiles.values()),matrix.items)])
+        result = evaluate_baskets(matrix,quantities,Scenario({catalog.key(scenario_item): shock}))
+        
+        with col[1]:
+            price_rn = result.current[0]
+            future_price = result.future[0]
+            metrics = st.columns(3)
+            metrics[0].metric(label='Custo Atual', value=f"R$ {price_rn:,.2f}")
+            metrics[1].metric(label=f'Custo em {matrix.horizon} meses (Estimativa)', value=f"R$ {future_price:,.2f}",
+                              delta=f"R$ {future_price - price_rn:,.2f}", delta_color="inverse")
+            metrics[2].metric(label='Intervalo (Estimativa)', value=f"R$ {result.cost_lower[0,-1]:,.2f} – {result.cost_upper[0,-1]:,.2f}")
+            
+            fig = create_basket_plot(result,"Custo da Cesta R$")
+            st.plotly_chart(fig,use_container_width=True)
+            
+            compare_df = pd.DataFrame({
+                "Perfil": list(profiles),
+                "Custo Atual": result.current[1:],
+                "Custo Previsão": result.future[1:],
+            })
+            compare_df["Diferença %"] = compare_df["Custo Previsão"]*100/compare_df["Custo Atual"] -100
+            st.dataframe(compare_df.round(2),hide_index=True)
+
+def export_section():
+    
+    export_names = {"panel":"Painel de Preços e Inflação","stats":"Estatísticas","supermarket":"Dados dos Supermercados"}
+    
+    st.markdown(f"<h5 style='text-align: center;'>📦 Exportar Dados</h5>", unsafe_allow_html=True)
+    col = st.columns(3)
+    with col[0]:
+        kind = st.selectbox("Dados", list(export_names), format_func=export_names.get)
+    with col[1]:
+        fmt = st.selectbox("Formato", FORMATS)
+    with col[2]:
+        st.write(" ")
+        # The file is only written when the button is clicked, and never cached
+        st.download_button("Baixar", data=lambda: export_bytes(kind,dataset,catalog,fmt,horizon),
+                           file_name=f"breakfast_{kind}.{fmt}", on_click="ignore", use_container_width=True)
+
+def rank_recipes(df_down):
+    return recipe_index(price_version,horizon,dataset,catalog).rank(list(catalog.to_keys(df_down["Item"])))
+
+def gemini_recipes(df_down,ranked):
+    prompt = f"""
+    Você é um chef especializado em café da manhã saudável. Sua missão é aprimorar as cinco receitas a seguir, que utilizam como foco os ingredientes {df_down['Item'].values}: {[recipe.title for recipe in ranked]}.
+
+    Diretrizes:
+    - Mantenha a essência de cada receita, sugerindo variações e detalhes que as deixem mais deliciosas e nutritivas.
+    - Não faça combinações esquisitas de ingredientes, foque em receitas que já existem.
+    - Seja claro em suas instruções, evite deixar passos vagos
+    - Não se apresente, apenas forneça as receitas.
+    - Cada receita deve conter:
+    1. Um título, precedido pela marcação "<RECETA>" para facilitar a separação.
+    2. Uma breve explicação sobre por que essa refeição é uma boa escolha, foque nos possiveis beneficios a saude, a explicação deve ter o formato *texto*.
+    3. A lista de ingredientes com quantidades.
+    4. O modo de preparo com instruções claras e objetivas.
+    5. A descrição dos macronutrientes aproximados, incluindo calorias, proteínas, carboidratos, gorduras e fibras.
+    6. O titulo da receita deve ter o seguinte formato **Titulo**
+    Seja detalhado e direto, garantindo que as receitas sejam fáceis de entender e seguir.
+    """
+    return call_gemini(prompt,price_version).split("<RECETA>")
+
+def general_info_all(scheduler):
     
+    with st.container(border=True):
+        st.markdown(f"<h3 style='text-align: center;'>📊 Estatísticas</h3>", unsafe_allow_html=True)
+        stats_section = st.empty()
+        stats_section.caption(LOADING)
     
     with st.container(border=True):
         st.markdown(f"<h3 style='text-align: center;'>🍽️ Sugestão de Receitas</h3>", unsafe_allow_html=True)
         
-        prompt = f"""
-        Você é um chef especializado em café da manhã saudável. Sua missão é criar cinco receitas nutritivas utilizando os seguintes ingredientes como foco: {df_down['Item'].values}.
-
-        Diretrizes:
-        - Faça receitas deliciosas, que além de nutritivas sejam palatáveis, por exemplo combinações estranhas como cuscuz e mamão misturados devem ser evitadas.
-        - Não faça combinações esquisitas de ingredientes, foque em receitas que já existem.
-        - Seja claro em suas instruções, evite deixar passos vagos
-        - Não se apresente, apenas forneça as receitas.
-        - Cada receita deve conter:
-        1. Um título, precedido pela marcação "<RECETA>" para facilitar a separação.
-        2. Uma breve explicação sobre por que essa refeição é uma boa escolha, foque nos possiveis beneficios a saude, a explicação deve ter o formato *texto*.
-        3. A lista de ingredientes com quantidades.
-        4. O modo de preparo com instruções claras e objetivas.
-        5. A descrição dos macronutrientes aproximados, incluindo calorias, proteínas, carboidratos, gorduras e fibras.
-        6. O titulo da receita deve ter o seguinte formato **Titulo**
-        Seja detalhado e direto, garantindo que as receitas sejam fáceis de entender e seguir.
-        """
-        response_text = call_gemini(prompt)
-        response_text = response_text.split("<RECETA>")
+        enrich = st.toggle("✨ Enriquecer as sugestões com IA (Gemini)", value=False)
+        if enrich:
+            scheduler.submit("gemini",lambda: gemini_recipes(scheduler.result("split")[0],scheduler.result("recipes")),after=["split","recipes"])
+        recipes_section = st.empty()
+        recipes_section.caption(LOADING)
+    
+    def render():
+        stats_df = scheduler.result("stats")
+        df_down, df_up = scheduler.result("split")
         
-        for index,recipe in enumerate(response_text[1:]):
-            match = re.search(r"\*\*(.*?)\*\*", recipe)
-            with st.expander(f"{index+1}. {match.group(1)}"):
-                st.markdown(recipe)
+        with stats_section.container():
+            tab = st.tabs(["Resumo","Dados"])
+            with tab[0]:
+                col = st.columns(2)
+                
+                with col[0]:
+                    with st.container(border=True):
+                        st.markdown(f"<h5 style='text-align: center;'>Itens em Baixa 📉</h5>", unsafe_allow_html=True)
+                        st.dataframe(
+                                    df_down[["Item", "Preço","Preço Previsão","Diferença R$"]]
+                                    .rename(columns={"Diferença R$": "Diminuição"})
+                                    .sort_values('Diminuição', ascending=True),
+                                    hide_index=True
+                                    )
+                with col[1]:
+                    with st.container(border=True):
+                        st.markdown(f"<h5 style='text-align: center;'>Itens em Alta 📈</h5>", unsafe_allow_html=True)
+                        st.dataframe(
+                                    df_up[["Item", "Preço","Preço Previsão", "Diferença R$"]]
+                                    .rename(columns={"Diferença R$": "Aumento"})
+                                    .sort_values('Aumento', ascending=False),
+                                    hide_index=True
+                                    )
+                    
+            with tab[1]:
+                st.dataframe(stats_df,hide_index=True)
+                export_section()
         
-      
-general, solo = st.tabs(["Análise Geral","Análise Detalhada Idividual"])
-
-with general:    
-    info_time_series_general()
-with solo:
-    info_time_series_solo()
-
-general_info_all()
+        ranked = scheduler.result("recipes")
+        
+        with recipes_section.container():
+            response_text = None
+            if enrich:
+                try:
+                    response_text = scheduler.result("gemini")
+                except Exception as e:
+                    print(f"Error {e}")
+                    st.warning("Não foi possível consultar o Gemini, exibindo as sugestões locais.")
+            
+            if response_text:
+                for index,recipe in enumerate(response_text[1:]):
+                    match = re.search(r"\*\*(.*?)\*\*", recipe)
+                    with st.expander(f"{index+1}. {match.group(1) if match else 'Receita'}"):
+                        st.markdown(recipe)
+            else:
+                for index,recipe in enumerate(ranked):
+                    with st.expander(f"{index+1}. {recipe.title}"):
+                        st.markdown(recipe_markdown(recipe))
+    
+    return render
+
+# Sections that don't depend on widgets start right away, the others as soon as their widgets are read.
+# Cached helpers run on the pool, so they don't show spinners, and the workers drop the context after each task
+scheduler = SectionScheduler(on_start=lambda: add_script_run_ctx(threading.current_thread(),ctx),
+                             on_finish=lambda: setattr(threading.current_thread(),SCRIPT_RUN_CONTEXT_ATTR_NAME,None))
+try:
+    scheduler.submit("price_matrix",price_matrix,price_version,horizon,dataset,catalog)
+    scheduler.submit("stats",stats_table,price_version,horizon,dataset,catalog)
+    scheduler.submit("split",split_table,price_version,horizon,dataset,catalog,after=["stats"])
+    scheduler.submit("recipes",lambda: rank_recipes(scheduler.result("split")[0]),after=["split","price_matrix"])
+
+    general, solo, basket = st.tabs(["Análise Geral","Análise Detalhada Idividual","🧺 Minha Cesta"])
+
+    with general:    
+        render_general = info_time_series_general(scheduler)
+    with solo:
+        render_solo = info_time_series_solo(scheduler)
+
+    render_all = general_info_all(scheduler)
+
+    with basket:
+        info_basket(scheduler)
+
+    for render in [render_general,render_solo,render_all]:
+        render()
+finally:
+    # A rerun or a stop interrupts the script: the sections that haven't started are dropped
+    scheduler.cancel()
+
+with st.sidebar.expander("⏱️ Desempenho"):
+    report = scheduler.report()
+    st.caption(f"Tempo total: {report.wall*1000:.0f} ms · Soma das seções: {report.serial*1000:.0f} ms · "
+               f"Caminho crítico: {report.critical_path*1000:.0f} ms ({' → '.join(report.path)})")
+    if session is not None:
+        st.caption(f"Memória desta sessão: {session.nbytes/1024:,.1f} KB · Sessões ativas: {len(registry.sessions)} · "
+                   f"Total: {registry.total_bytes()/1024**2:,.2f} MB")
 
 
 footer = """
@@ -0,0 +1,192 @@
+"""
+Headless JSON API over the same computations used by the Streamlit pages.
+
+Run with:
+
+    uvicorn breakfast.api:app
+
+Every response is keyed by the version of the sheets it depends on: bodies are
+serialized and gzip-compressed once per version and then served from memory,
+with ETag and Last-Modified headers so clients can revalidate with a 304. A new
+dataset only evicts the responses whose sheets changed.
+"""
+import gzip
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import format_datetime, parsedate_to_datetime
+
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response
+
+from breakfast import store as derived
+from breakfast.catalog import get_catalog
+from breakfast.data import latest_etl, load_dataset
+from breakfast.forecast import DEFAULT_HORIZON, MAX_HORIZON, PRICE_DEPENDENCIES
+from breakfast.versioning import VersionedCache, bus, fingerprint
+
+RELOAD_INTERVAL = 3600
+Horizon = Query(DEFAULT_HORIZON, ge=1, le=MAX_HORIZON, description="Meses de previsão")
+RESOURCES = {
+    "items": ("breakfast_id",),
+    "series": PRICE_DEPENDENCIES,
+    "seasonality": ("breakfast_id","seasonality_forecast"),
+    "stats": PRICE_DEPENDENCIES,
+}
+SERIES_COLUMNS = ["ds","model","y","y_lower","y_upper","trend","trend_lower","trend_upper","price","price_lower","price_upper"]
+
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    last_modified: str
+
+
+def to_json_bytes(df):
+    return df.to_json(orient="records", date_format="iso", force_ascii=False).encode("utf-8")
+
+
+def close_caches(caches):
+    for cache in caches:
+        cache.close()
+
+
+class ApiState:
+    """Holds the current dataset and the encoded responses computed from it."""
+
+    def __init__(self, loader=load_dataset, reload_interval=RELOAD_INTERVAL):
+        self.loader = loader
+        self.reload_interval = reload_interval
+        self.lock = threading.Lock()
+        self.dataset = None
+        self.catalog = None
+        self.version = None
+        self.last_modified = None
+        self.loaded_at = 0.0
+        self.caches = {resource: VersionedCache(f"api.{resource}.{id(self)}", depends_on)
+                       for resource, depends_on in RESOURCES.items()}
+        # The bus holds the caches, so they are unsubscribed when the state goes away
+        self._finalizer = weakref.finalize(self, close_caches, list(self.caches.values()))
+
+    def close(self):
+        self._finalizer()
+
+    def current(self):
+        if self.dataset is None or time.monotonic() - self.loaded_at > self.reload_interval:
+            with self.lock:
+                if self.dataset is None or time.monotonic() - self.loaded_at > self.reload_interval:
+                    self.load(self.loader())
+        return self.dataset, self.catalog, self.version
+
+    def load(self, dataset):
+        version = fingerprint(dataset)
+        bus.publish(version)
+        self.dataset = dataset
+        self.catalog = get_catalog(dataset["breakfast_id"])
+        derived.materialize(dataset, self.catalog)
+        self.version = version
+        self.last_modified = format_datetime(pd.Timestamp(latest_etl(dataset)).tz_localize("UTC").to_pydatetime(), usegmt=True)
+        self.loaded_at = time.monotonic()
+
+    def get(self, resource, key, compute):
+        dataset, catalog, version = self.current()
+        cache = self.caches[resource]
+
+        def encode():
+            body = to_json_bytes(compute(dataset, catalog))
+            return CachedResponse(
+                body=body,
+                gzip_body=gzip.compress(body, compresslevel=6),
+                etag=f'W/"{cache.scope(version)}"',
+                last_modified=self.last_modified,
+            )
+
+        return cache.get_or_compute(version, key, encode)
+
+
+def not_modified(request, entry):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return parsedate_to_datetime(if_modified_since) >= parsedate_to_datetime(entry.last_modified)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(request, entry):
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(entry.gzip_body, media_type="application/json", headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+def create_app(loader=load_dataset, reload_interval=RELOAD_INTERVAL):
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        app.state.api.close()
+
+    app = FastAPI(title="Breakfast Forecast API", lifespan=lifespan)
+    app.state.api = ApiState(loader, reload_interval)
+
+    # Handlers are plain functions: FastAPI runs them in its thread pool, so a dataset
+    # reload or a cache miss doesn't block the event loop. They read the state from the
+    # app instead of closing over it, since FastAPI keeps the endpoints in global caches
+    def check_item(catalog, item):
+        if item not in catalog:
+            raise HTTPException(status_code=404, detail=f"Item desconhecido: {item}")
+
+    @app.get("/items")
+    def items(request: Request):
+        entry = request.app.state.api.get("items", None, lambda dataset, catalog: catalog.to_frame())
+        return respond(request, entry)
+
+    @app.get("/items/{item}/series")
+    def item_series(item: str, request: Request, horizon: int = Horizon):
+        state = request.app.state.api
+        check_item(state.current()[1], item)
+
+        def compute(dataset, catalog):
+            series_forecast = derived.price_series(dataset, item, horizon)
+            return series_forecast[[col for col in SERIES_COLUMNS if col in series_forecast.columns]]
+
+        return respond(request, state.get("series", (item, horizon), compute))
+
+    @app.get("/items/{item}/seasonality")
+    def item_seasonality(item: str, request: Request):
+        state = request.app.state.api
+        check_item(state.current()[1], item)
+
+        def compute(dataset, catalog):
+            return derived.seasonality(dataset, catalog.id(item))[["ds","season"]]
+
+        return respond(request, state.get("seasonality", item, compute))
+
+    @app.get("/stats")
+    def stats(request: Request, horizon: int = Horizon):
+        entry = request.app.state.api.get("stats", horizon, lambda dataset, catalog: derived.stats(dataset, catalog, horizon))
+        return respond(request, entry)
+
+    return app
+
+
+app = create_app()
@@ -0,0 +1,139 @@
+"""
+Breakfast basket cost engine.
+
+A basket is a vector with the quantity of each catalog item, measured in the
+item portion (e.g. 2 of "250g" of coffee). The cost of many baskets over every
+forecast horizon is a single matrix product against the per-item price paths
+produced by `get_price_df`.
+"""
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from breakfast.data import latest_etl
+from breakfast.forecast import DEFAULT_HORIZON, get_price_df
+
+PROFILES_PATH = Path(__file__).resolve().parent.parent / "config" / "baskets.json"
+
+
+@dataclass
+class PriceMatrix:
+    """
+    Price paths of all items, from the present (column 0) to the last forecast month.
+
+    `price`, `price_lower` and `price_upper` have shape (n_items, n_horizons + 1).
+    """
+    items: np.ndarray
+    dates: pd.DatetimeIndex
+    price: np.ndarray
+    price_lower: np.ndarray
+    price_upper: np.ndarray
+
+    @property
+    def horizon(self):
+        return len(self.dates) - 1
+
+    def stacked(self):
+        return np.hstack([self.price, self.price_lower, self.price_upper])
+
+
+@dataclass
+class Scenario:
+    """
+    What-if overrides on top of the forecast.
+
+    `inflation` maps an item to an extra accumulated inflation (in %) reached at
+    the last horizon, spread geometrically over the months: {"cafe": 10} makes
+    coffee end the horizon 10% above its forecast.
+    """
+    inflation: dict = field(default_factory=dict)
+
+    def factors(self, matrix):
+        shocks = np.zeros(len(matrix.items))
+        index = {item: i for i, item in enumerate(matrix.items)}
+        for item, value in self.inflation.items():
+            shocks[index[item]] = value
+
+        steps = np.arange(matrix.horizon + 1) / max(matrix.horizon, 1)
+        return (1 + shocks[:, None] / 100) ** steps[None, :]
+
+
+@dataclass
+class BasketCost:
+    """Cost of each basket (rows) at each horizon (columns)."""
+    dates: pd.DatetimeIndex
+    cost: np.ndarray
+    cost_lower: np.ndarray
+    cost_upper: np.ndarray
+
+    @property
+    def current(self):
+        return self.cost[:, 0]
+
+    @property
+    def future(self):
+        return self.cost[:, -1]
+
+    def to_frame(self, names=None):
+        names = range(len(self.cost)) if names is None else names
+        frames = []
+        for column, values in [("cost", self.cost), ("cost_lower", self.cost_lower), ("cost_upper", self.cost_upper)]:
+            frames.append(pd.DataFrame(values, index=names, columns=self.dates).stack().rename(column))
+        return pd.concat(frames, axis=1).rename_axis(["basket", "ds"]).reset_index()
+
+
+def build_price_matrix(dataset, catalog, items=None, horizon=DEFAULT_HORIZON):
+    date = pd.Timestamp(latest_etl(dataset))
+    items = catalog.keys if items is None else np.asarray(items, dtype=object)
+
+    paths = []
+    for item in items:
+        series_forecast = get_price_df(dataset, item, horizon)
+        present_index = int((series_forecast["ds"] < date).sum()) - 1
+        paths.append(series_forecast.iloc[present_index:])
+
+    length = min(len(path) for path in paths)
+    paths = [path.iloc[:length] for path in paths]
+
+    return PriceMatrix(
+        items=items,
+        dates=pd.DatetimeIndex(paths[0]["ds"]),
+        price=np.vstack([path["price"].to_numpy(dtype=float) for path in paths]),
+        price_lower=np.vstack([path["price_lower"].to_numpy(dtype=float) for path in paths]),
+        price_upper=np.vstack([path["price_upper"].to_numpy(dtype=float) for path in paths]),
+    )
+
+
+def basket_vectors(baskets, items):
+    """Turn a list of {item: quantity} dicts into a (n_baskets, n_items) matrix."""
+    index = {item: i for i, item in enumerate(items)}
+    quantities = np.zeros((len(baskets), len(items)))
+    for row, basket in enumerate(baskets):
+        for item, quantity in basket.items():
+            quantities[row, index[item]] = quantity
+    return quantities
+
+
+def evaluate_baskets(matrix, quantities, scenario=None):
+    """
+    Cost of every basket over every horizon.
+
+    `quantities` has shape (n_baskets, n_items), or (n_items,) for a single basket.
+    """
+    quantities = np.atleast_2d(np.asarray(quantities, dtype=float))
+    prices = matrix.stacked()
+
+    if scenario is not None and scenario.inflation:
+        prices = prices * np.tile(scenario.factors(matrix), 3)
+
+    costs = quantities @ prices
+    cost, cost_lower, cost_upper = np.split(costs, 3, axis=1)
+    return BasketCost(dates=matrix.dates, cost=cost, cost_lower=cost_lower, cost_upper=cost_upper)
+
+
+def load_profiles(path=PROFILES_PATH):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
@@ -0,0 +1,139 @@
+import json
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+CONFIG_PATH = Path(__file__).resolve().parent.parent / "config" / "items.json"
+
+DEFAULT_CATEGORY = "Outros"
+
+
+class ItemCatalog:
+    """
+    Catalog of the breakfast items.
+
+    Holds, for every item, its key (as used in the sheets), display name, unit
+    (portion used in the analysis), id and category. Single lookups are O(1) in
+    both directions and whole columns are mapped through categorical codes, so
+    the cost of mapping does not depend on Python calls per row.
+    """
+
+    def __init__(self, keys, displays, units, ids, categories):
+        self.keys = np.asarray(keys, dtype=object)
+        self.displays = np.asarray(displays, dtype=object)
+        self.units = np.asarray(units, dtype=object)
+        self.ids = np.asarray(ids)
+        self.categories = np.asarray(categories, dtype=object)
+
+        self._key_index = {key: i for i, key in enumerate(self.keys)}
+        self._display_index = {display: i for i, display in enumerate(self.displays)}
+
+        if len(self._key_index) != len(self.keys):
+            raise ValueError("Duplicated item keys in the catalog.")
+        if len(self._display_index) != len(self.displays):
+            raise ValueError("Duplicated display names in the catalog.")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self._key_index
+
+    # Single lookups
+    def pretty(self, key):
+        index = self._key_index.get(key)
+        return None if index is None else self.displays[index]
+
+    def key(self, display):
+        index = self._display_index.get(display)
+        return None if index is None else self.keys[index]
+
+    def unit(self, key):
+        return self.units[self._key_index[key]]
+
+    def id(self, key):
+        return self.ids[self._key_index[key]]
+
+    def category(self, key):
+        return self.categories[self._key_index[key]]
+
+    # Vectorized mappings
+    def codes(self, keys):
+        """Position of each key in the catalog (-1 for unknown keys)."""
+        return pd.Categorical(np.asarray(keys, dtype=object), categories=self.keys).codes
+
+    def to_display(self, keys):
+        return self._map(keys, self.keys, self.displays)
+
+    def to_keys(self, displays):
+        return self._map(displays, self.displays, self.keys)
+
+    def to_units(self, keys):
+        return self._take(keys, self.units)
+
+    def to_categories(self, keys):
+        return self._take(keys, self.categories)
+
+    def _map(self, values, source, target):
+        codes = pd.Categorical(np.asarray(values, dtype=object), categories=source).codes
+        mapped = pd.Categorical.from_codes(codes, categories=target)
+        if isinstance(values, pd.Series):
+            return pd.Series(mapped, index=values.index, name=values.name)
+        return mapped
+
+    def _take(self, keys, target):
+        # Units and categories repeat between items, so they can't be categories themselves
+        codes = self.codes(keys)
+        result = np.where(codes >= 0, target[codes], None)
+        if isinstance(keys, pd.Series):
+            return pd.Series(result, index=keys.index, name=keys.name)
+        return result
+
+    def to_frame(self):
+        return pd.DataFrame({
+            "item": self.keys,
+            "display": self.displays,
+            "unit": self.units,
+            "id": self.ids,
+            "category": self.categories,
+        })
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def build_catalog(id_df, config=None):
+    """
+    Build the catalog from the `breakfast_id` sheet and the items config.
+
+    Items present in the sheet but missing from the config still get an entry,
+    using the key itself as display name.
+    """
+    if config is None:
+        config = load_config()
+
+    keys = id_df["item"].to_numpy(dtype=object)
+    entries = [config.get(key, {}) for key in keys]
+
+    return ItemCatalog(
+        keys=keys,
+        displays=[entry.get("display", key.title()) for key, entry in zip(keys, entries)],
+        units=[entry.get("unit", "") for entry in entries],
+        ids=id_df["id"].to_numpy(),
+        categories=[entry.get("category", DEFAULT_CATEGORY) for entry in entries],
+    )
+
+
+@lru_cache(maxsize=8)
+def _cached_catalog(pairs):
+    keys, ids = zip(*pairs) if pairs else ((), ())
+    return build_catalog(pd.DataFrame({"item": keys, "id": ids}))
+
+
+def get_catalog(id_df):
+    """Catalog for the given `breakfast_id` frame, shared by every page and rerun."""
+    return _cached_catalog(tuple(zip(id_df["item"].tolist(), id_df["id"].tolist())))
@@ -0,0 +1,72 @@
+import os
+import tomllib
+from pathlib import Path
+
+import gspread
+import pandas as pd
+from gspread_dataframe import get_as_dataframe
+from oauth2client.service_account import ServiceAccountCredentials
+
+
+SHEET_NAME = "breakfast_forecast"
+PAGES = ["breakfast_id","breakfast_timeseries","seasonality_forecast","series_forecast","supermarket_items"]
+SECRETS_PATH = Path(__file__).resolve().parent.parent / ".streamlit" / "secrets.toml"
+
+# Directory with one CSV per page, used instead of the Google Sheet when set
+LOCAL_DATA_ENV = "BREAKFAST_DATA_DIR"
+
+
+def load_secrets(path=SECRETS_PATH):
+    """Read the Streamlit secrets file, for code running outside of Streamlit."""
+    with open(path, "rb") as file:
+        return tomllib.load(file)
+
+
+def load_sheets(service_account_info, sheet_name=SHEET_NAME):
+    # Escopos de acesso
+    scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
+
+    # Autenticação
+    creds = ServiceAccountCredentials.from_json_keyfile_dict(dict(service_account_info), scope)
+    client = gspread.authorize(creds)
+
+    # Abrir a planilha pelo nome
+    sheet = client.open(sheet_name)
+
+    dataset = {}
+
+    for page in PAGES:
+        worksheet = sheet.worksheet(page)
+        df = get_as_dataframe(worksheet, evaluate_formulas=True)
+        dataset[page] = df
+
+    return dataset
+
+
+def load_local(directory):
+    return {page: pd.read_csv(Path(directory) / f"{page}.csv") for page in PAGES}
+
+
+def save_local(dataset, directory):
+    Path(directory).mkdir(parents=True, exist_ok=True)
+    for page in PAGES:
+        dataset[page].to_csv(Path(directory) / f"{page}.csv", index=False)
+
+
+def load_dataset(secrets=None):
+    """
+    Load the dataset from the local CSVs in `BREAKFAST_DATA_DIR`, when set, or from the Google Sheet.
+
+    `secrets` defaults to the Streamlit secrets file and is only read for the sheet.
+    """
+    directory = os.environ.get(LOCAL_DATA_ENV)
+    if directory:
+        return load_local(directory)
+
+    if secrets is None:
+        secrets = load_secrets()
+    return load_sheets(secrets["gspread_service_account"])
+
+
+def latest_etl(dataset):
+    return dataset["supermarket_items"]["ETL"].max()
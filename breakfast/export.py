@@ -0,0 +1,128 @@
+"""
+Bulk export of the price/inflation panel, the stats table and the raw supermarket rows.
+
+Data is written in chunks (one item at a time for the panel), so the memory
+used by the export does not grow with the number of items. The same writer
+backs the download button in the app and the command line:
+
+    python -m breakfast.export panel --format parquet --output painel.parquet
+"""
+import argparse
+import io
+
+import pandas as pd
+
+from breakfast.catalog import get_catalog
+from breakfast.data import latest_etl, load_dataset
+from breakfast.forecast import DEFAULT_HORIZON, MAX_HORIZON, get_price_df, return_stats_df
+
+FORMATS = ["csv", "parquet"]
+CHUNK_SIZE = 50_000
+PANEL_COLUMNS = ["item","ds","horizon","y","y_lower","y_upper","price","price_lower","price_upper"]
+
+
+def iter_frame(df, chunk_size=CHUNK_SIZE):
+    for start in range(0, len(df), chunk_size):
+        yield df.iloc[start:start + chunk_size]
+
+
+def iter_price_panel(dataset, catalog, horizon=DEFAULT_HORIZON, items=None):
+    """
+    Yield the price/inflation panel in long format, one item per chunk.
+
+    `horizon` is the number of months ahead of the last ETL (0 is the present,
+    negative values are history).
+    """
+    date = pd.Timestamp(latest_etl(dataset))
+    items = catalog.keys if items is None else items
+
+    for item in items:
+        series_forecast = get_price_df(dataset, item, horizon)
+        present_index = int((series_forecast["ds"] < date).sum()) - 1
+
+        series_forecast["item"] = item
+        series_forecast["horizon"] = range(-present_index, len(series_forecast) - present_index)
+        yield series_forecast.reindex(columns=PANEL_COLUMNS)
+
+
+def iter_stats(dataset, catalog, horizon=DEFAULT_HORIZON, chunk_size=CHUNK_SIZE):
+    yield from iter_frame(return_stats_df(dataset, catalog, horizon), chunk_size)
+
+
+def iter_supermarket_rows(dataset, catalog, horizon=DEFAULT_HORIZON, chunk_size=CHUNK_SIZE):
+    yield from iter_frame(dataset["supermarket_items"], chunk_size)
+
+
+EXPORTS = {
+    "panel": iter_price_panel,
+    "stats": iter_stats,
+    "supermarket": iter_supermarket_rows,
+}
+
+
+def write_csv(chunks, sink):
+    for index, chunk in enumerate(chunks):
+        sink.write(chunk.to_csv(index=False, header=index == 0).encode("utf-8"))
+
+
+def write_parquet(chunks, sink):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("A exportação em Parquet requer o pacote pyarrow.") from e
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def export(kind, dataset, catalog, sink, fmt="csv", horizon=DEFAULT_HORIZON):
+    """Write the export `kind` to `sink` (a path or a binary file object)."""
+    if kind not in EXPORTS:
+        raise ValueError(f"Unknown export {kind!r}, expected one of {list(EXPORTS)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+
+    chunks = EXPORTS[kind](dataset, catalog, horizon)
+
+    if fmt == "parquet":
+        write_parquet(chunks, sink)
+    elif isinstance(sink, (str, bytes)) or hasattr(sink, "__fspath__"):
+        with open(sink, "wb") as file:
+            write_csv(chunks, file)
+    else:
+        write_csv(chunks, sink)
+
+
+def export_bytes(kind, dataset, catalog, fmt="csv", horizon=DEFAULT_HORIZON):
+    """The export as bytes, as `st.download_button` expects them."""
+    sink = io.BytesIO()
+    export(kind, dataset, catalog, sink, fmt, horizon)
+    return sink.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta os dados do Breakfast Forecast.")
+    parser.add_argument("kind", choices=list(EXPORTS))
+    parser.add_argument("--format", choices=FORMATS, default="csv", dest="fmt")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--horizon", type=int, choices=range(1, MAX_HORIZON + 1), default=DEFAULT_HORIZON, metavar=f"1-{MAX_HORIZON}",
+                        help="meses de previsão")
+    args = parser.parse_args(argv)
+
+    dataset = load_dataset()
+    export(args.kind, dataset, get_catalog(dataset["breakfast_id"]), args.output, args.fmt, args.horizon)
+
+
+if __name__ == "__main__":
+    main()
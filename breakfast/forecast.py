@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+
+from breakfast.data import latest_etl
+from breakfast.pricing import estimate_prices
+from breakfast.versioning import VersionedCache, fingerprint
+
+DEFAULT_HORIZON = 6
+MAX_HORIZON = 24
+
+# Sheets used by the price series and everything derived from them
+PRICE_DEPENDENCIES = ("breakfast_id","series_forecast","seasonality_forecast","supermarket_items")
+
+
+def get_mean_price(item,dataset,supermarket=None):
+    """Current price of `item` (optionally in one supermarket), from the robust estimates of the latest ETL."""
+    return estimate_prices(dataset).price(item,supermarket)
+
+def season_by_month(dataset,id):
+    season_forecast = dataset["seasonality_forecast"]
+    season_forecast = season_forecast[season_forecast["id"]==id]
+    return season_forecast.groupby(pd.to_datetime(season_forecast["ds"]).dt.month)["season"].mean()
+
+def extension_rows(future_data,seasonality,steps):
+    """
+    Forecast rows for `steps` months after the end of the sheet forecast.
+
+    The trend keeps the mean slope of the sheet forecast, the monthly seasonality
+    is added on top, and the bands keep their last width growing with sqrt(horizon).
+    """
+    last = future_data.iloc[-1]
+    trend = future_data["trend"].to_numpy(dtype=float)
+    slope = (trend[-1] - trend[0]) / (len(trend) - 1) if len(trend) > 1 else 0.0
+    widen = np.sqrt((len(future_data) + steps) / len(future_data))
+    
+    ds = pd.date_range(last["ds"] + pd.DateOffset(months=int(steps[0])), periods=len(steps), freq="MS")
+    trend = last["trend"] + slope*steps
+    y = trend + ds.month.map(seasonality).fillna(0).to_numpy()
+    
+    return pd.DataFrame({
+        "id": last["id"],
+        "ds": ds,
+        "y": y,
+        "y_lower": y - (last["y"] - last["y_lower"])*widen,
+        "y_upper": y + (last["y_upper"] - last["y"])*widen,
+        "trend": trend,
+        "trend_lower": trend - (last["trend"] - last["trend_lower"])*widen,
+        "trend_upper": trend + (last["trend_upper"] - last["trend"])*widen,
+        "model": 1,
+    })
+
+class HorizonExtensions:
+    """
+    Forecast months beyond the sheet, per item and dataset version.
+
+    Only the longest extension computed so far is kept: shorter horizons are slices of
+    it and longer ones only compute the missing months.
+    """
+    
+    def __init__(self):
+        self.cache = VersionedCache("horizon_extensions",PRICE_DEPENDENCIES)
+    
+    def get(self,dataset,item,future_data,n_months):
+        version = fingerprint(dataset)
+        with self.cache.lock:
+            rows = self.cache.get(version,item)
+            done = 0 if rows is None else len(rows)
+            if done < n_months:
+                id = future_data["id"].iloc[-1]
+                new_rows = extension_rows(future_data,season_by_month(dataset,id),np.arange(done+1,n_months+1))
+                rows = new_rows if rows is None else pd.concat([rows,new_rows],ignore_index=True)
+                self.cache.set(version,item,rows)
+        
+        return rows.iloc[:n_months]
+
+extensions = HorizonExtensions()
+
+def forecast_horizon(dataset,item,future_data,horizon=DEFAULT_HORIZON):
+    if not 1 <= horizon <= MAX_HORIZON:
+        raise ValueError(f"horizon must be between 1 and {MAX_HORIZON}, got {horizon}")
+    
+    if horizon <= len(future_data):
+        return future_data.iloc[:horizon]
+    if future_data.empty:
+        # The forecast job lags the scrape: there is nothing to extend from
+        return future_data
+    return pd.concat([future_data,extensions.get(dataset,item,future_data,horizon-len(future_data))],ignore_index=True)
+
+def compound(anchor,growth,present_index):
+    """Future prices compounded from `anchor`, the price at `present_index` - 1."""
+    return anchor*np.cumprod(growth[present_index-1:-1])
+
+def get_price_df(dataset,item,horizon=DEFAULT_HORIZON):
+    
+    id_data = dataset["breakfast_id"]
+
+    id = id_data[id_data["item"]==item]["id"].values[0]
+
+    series_forecast = dataset["series_forecast"]
+    series_forecast = series_forecast[series_forecast["id"]==id].copy()
+    series_forecast["ds"] = pd.to_datetime(series_forecast["ds"])
+    
+    date = latest_etl(dataset)
+
+    past_data = series_forecast[series_forecast["ds"]<date].reset_index(drop=True)
+    future_data = series_forecast[series_forecast["ds"]>=date].reset_index(drop=True)
+    future_data = forecast_horizon(dataset,item,future_data,horizon)
+
+    price_rn = get_mean_price(item,dataset)
+    present_index = len(past_data)
+
+    past_data = pd.concat([past_data,future_data]).reset_index(drop=True)
+    
+    growth = 1 + past_data["y"].to_numpy(dtype=float)/100
+    
+    # Past prices are deflated from the current price, future ones compounded from it
+    price = np.empty(len(past_data))
+    price[:present_index] = price_rn / np.r_[np.cumprod(growth[1:present_index][::-1])[::-1], 1.0]
+    price[present_index:] = compound(price_rn,growth,present_index)
+    past_data["price"] = price
+    
+    for bound in ["lower","upper"]:
+        price = np.full(len(past_data),np.nan)
+        price[present_index-1] = price_rn
+        price[present_index:] = compound(price_rn,1 + past_data[f"y_{bound}"].to_numpy(dtype=float)/100,present_index)
+        past_data[f"price_{bound}"] = price
+    
+    return past_data
+
+def inflation_label(horizon):
+    return f"Inflação Média Próximos {horizon} Meses"
+
+def return_stats_df(dataset,catalog,horizon=DEFAULT_HORIZON,series=None):
+    # `series` optionally holds the get_price_df results already computed, by item
+    series = {} if series is None else series
+    supermarket_df = dataset["supermarket_items"]
+    
+    items = supermarket_df["item"].unique()
+    
+    stats = {"Item":[],"Medida":[],"Preço":[],"Preço Previsão":[],"Diferença %":[],"Diferença R$":[],"Nº Itens Estudados":[],inflation_label(horizon):[]}
+    
+    # Rows behind the current price, i.e. of the latest ETL, as in the individual analysis
+    n_rows = estimate_prices(dataset).items["n_rows"]
+    
+    for item in items:
+        series_forecast = series[item] if item in series else get_price_df(dataset,item,horizon)
+        
+        price_rn = get_mean_price(item,dataset,supermarket=None)
+        price_future = series_forecast["price"].iloc[-1]
+        mean_inflation = np.mean(series_forecast["y"].iloc[-horizon:].values)
+        
+        stats["Item"].append(catalog.pretty(item))
+        stats["Medida"].append(catalog.unit(item))
+        stats["Preço"].append(get_mean_price(item,dataset,supermarket=None))
+        stats["Preço Previsão"].append(series_forecast["price"].iloc[-1] )
+        stats["Diferença R$"].append(price_future-price_rn)
+        stats["Diferença %"].append(price_future*100/price_rn -100)
+        stats["Nº Itens Estudados"].append(int(n_rows.get(item,0)))
+        stats[inflation_label(horizon)].append(mean_inflation)
+        
+        
+    return pd.DataFrame(stats)
@@ -0,0 +1,210 @@
+"""
+Load test for the main page with concurrent simulated sessions.
+
+Each session is a Streamlit `AppTest` running `Página_Principal.py` against a
+synthetic dataset written to local CSVs (`BREAKFAST_DATA_DIR`), a temporary
+store of derived results (`BREAKFAST_STORE`) and a local stand-in for Gemini.
+Sessions follow random widget scripts and every rerun is timed. For each
+session count the tool reports rerun latency percentiles, throughput, the
+process RSS and the session state held by the sessions:
+
+    python -m breakfast.loadtest --sessions 1 2 4 8 --actions 10
+"""
+import argparse
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+import types
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from breakfast.catalog import load_config
+from breakfast.data import LOCAL_DATA_ENV, save_local
+from breakfast.sessions import shared_ids, state_nbytes
+from breakfast.store import STORE_ENV
+
+APP_PATH = Path(__file__).resolve().parent.parent / "Página_Principal.py"
+DATA_PAGE = "pages/2_Sobre_a_Coleta_de_Dados.py"
+MAIN_PAGE = "Página_Principal.py"
+SOLO_LABEL = "Escolha o item para a análise"
+
+
+def make_synthetic_dataset(n_items=12, n_months=72, n_future=6, rows_per_item=20, seed=0):
+    """Dataset with the same sheets and columns as the Google Sheet, filled with random data."""
+    rng = np.random.default_rng(seed)
+
+    keys = list(load_config())
+    keys = (keys + [f"item {i}" for i in range(len(keys), n_items)])[:n_items]
+    ids = np.arange(1, n_items + 1)
+
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=n_months - n_future, freq="MS")
+    dates = dates.append(pd.date_range(dates[-1] + pd.DateOffset(months=1), periods=n_future, freq="MS"))
+    etl = (dates[-n_future - 1] + pd.Timedelta(days=14)).strftime("%Y-%m-%d")
+
+    y = rng.normal(0.4, 1.0, (n_items, n_months))
+    trend = y.cumsum(axis=1) / np.arange(1, n_months + 1)
+    series_forecast = pd.DataFrame({
+        "id": np.repeat(ids, n_months),
+        "ds": np.tile(dates.strftime("%Y-%m-%d"), n_items),
+        "y": y.ravel(),
+        "y_lower": (y - 1).ravel(),
+        "y_upper": (y + 1).ravel(),
+        "trend": trend.ravel(),
+        "trend_lower": (trend - 0.5).ravel(),
+        "trend_upper": (trend + 0.5).ravel(),
+        "model": np.tile(np.r_[np.zeros(n_months - n_future), np.ones(n_future)].astype(int), n_items),
+    })
+
+    days = pd.date_range("2024-01-01", "2024-12-31", freq="D")
+    seasonality_forecast = pd.DataFrame({
+        "id": np.repeat(ids, len(days)),
+        "ds": np.tile(days.strftime("%Y-%m-%d"), n_items),
+        "season": np.tile(np.sin(np.arange(len(days)) * 2 * np.pi / 365), n_items),
+    })
+
+    supermarkets = ["Carrefour Hiper","Atacadão","Assaí","Pão de Açúcar","Barateiro"]
+    n_rows = n_items * rows_per_item
+    items = np.repeat(keys, rows_per_item)
+    supermarket_items = pd.DataFrame({
+        "item": items,
+        "price": rng.uniform(4, 40, n_rows).round(2),
+        "name": [f"{item} marca {i % 5}" for i, item in enumerate(items)],
+        "supermarket": rng.choice(supermarkets, n_rows),
+        "ETL": etl,
+    })
+
+    return {
+        "breakfast_id": pd.DataFrame({"item": keys, "id": ids}),
+        "breakfast_timeseries": series_forecast[series_forecast["model"]==0][["id","ds","y"]],
+        "seasonality_forecast": seasonality_forecast,
+        "series_forecast": series_forecast,
+        "supermarket_items": supermarket_items,
+    }
+
+
+def install_local_gemini():
+    """Replace the Gemini client with a local stand-in that answers instantly."""
+    import google.generativeai as genai
+
+    class LocalModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, prompt):
+            recipes = "".join(f"<RECETA> **Receita {i+1}**\n*Sugestão local.*\n" for i in range(5))
+            return types.SimpleNamespace(text=recipes)
+
+    genai.configure = lambda **kwargs: None
+    genai.GenerativeModel = LocalModel
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Session:
+    """A simulated user, driving one `AppTest` with random widget interactions."""
+
+    def __init__(self, seed, timeout=120):
+        from streamlit.testing.v1 import AppTest
+
+        self.random = random.Random(seed)
+        self.app = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+        self.app.secrets["api_keys"] = {"genimi_api": "local"}
+        self.latencies = []
+        self.errors = 0
+
+    def rerun(self, action):
+        start = time.perf_counter()
+        action()
+        self.latencies.append(time.perf_counter() - start)
+        self.errors += len(self.app.exception)
+
+    def change_multiselect(self):
+        widget = self.app.multiselect[0]
+        widget.set_value(self.random.sample(list(widget.options), self.random.randint(1, len(widget.options)))).run()
+
+    def switch_solo_item(self):
+        widget = next(widget for widget in self.app.selectbox if widget.label == SOLO_LABEL)
+        widget.set_value(self.random.choice(list(widget.options))).run()
+
+    def move_basket_slider(self):
+        self.app.slider[0].set_value(self.random.randint(-50, 50)).run()
+
+    def open_data_page(self):
+        self.app.switch_page(DATA_PAGE).run()
+        self.app.switch_page(MAIN_PAGE).run()
+
+    def state_bytes(self):
+        # Every AppTest runs with the same session id, so each session is measured here instead of in the registry
+        state = self.app.session_state
+        return state_nbytes(state, shared_ids(state["dataset"]) if "dataset" in state else frozenset())
+
+    def run(self, n_actions):
+        actions = [self.change_multiselect, self.switch_solo_item, self.move_basket_slider, self.open_data_page]
+        self.rerun(self.app.run)
+        for _ in range(n_actions):
+            self.rerun(self.random.choice(actions))
+
+
+def run_sessions(n_sessions, n_actions, seed=0):
+    sessions = [Session(seed + i) for i in range(n_sessions)]
+    threads = [threading.Thread(target=session.run, args=(n_actions,)) for session in sessions]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate([session.latencies for session in sessions]) * 1000
+    return {
+        "sessions": n_sessions,
+        "reruns": len(latencies),
+        "p50_ms": np.percentile(latencies, 50),
+        "p95_ms": np.percentile(latencies, 95),
+        "p99_ms": np.percentile(latencies, 99),
+        "reruns_per_s": len(latencies) / elapsed,
+        "rss_mb": rss_mb(),
+        "session_kb": sum(session.state_bytes() for session in sessions) / 1024,
+        "errors": sum(session.errors for session in sessions),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga com sessões simultâneas da página principal.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--actions", type=int, default=10, help="interações por sessão")
+    parser.add_argument("--items", type=int, default=12, help="itens no dataset sintético")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="salva o relatório em CSV")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_local(make_synthetic_dataset(n_items=args.items, seed=args.seed), directory)
+        os.environ[LOCAL_DATA_ENV] = directory
+        os.environ[STORE_ENV] = str(Path(directory) / "derived.sqlite")
+        install_local_gemini()
+
+        report = pd.DataFrame([run_sessions(n, args.actions, args.seed) for n in args.sessions])
+
+    print(report.round(1).to_string(index=False))
+    if args.output:
+        report.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Robust current-price estimates from the scraped supermarket rows.
+
+The rows of the latest ETL are optionally normalized to the catalog unit of each
+item (using the quantity parsed from the product name, e.g. "2 x 500g"), rows
+far from the rest of their item are rejected (MAD or IQR rule) and the kept
+rows are aggregated with a mean, median or trimmed mean. Everything is done
+for all items and supermarkets at once with grouped operations.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from breakfast.catalog import get_catalog
+from breakfast.data import latest_etl
+from breakfast.versioning import VersionedCache, fingerprint
+
+METHODS = {"mean": "Média", "median": "Mediana", "trimmed": "Média Aparada"}
+FILTERS = ["none", "mad", "iqr"]
+
+DEFAULT_METHOD = "median"
+DEFAULT_FILTER = "mad"
+TRIM = 0.1
+MAD_THRESHOLD = 3.0
+IQR_THRESHOLD = 1.5
+# Items with fewer rows than this are never filtered
+MIN_ROWS = 4
+
+QUANTITY_PATTERN = r"(?:(?P<pack>\d+)\s*x\s*)?(?P<amount>\d+(?:[.,]\d+)?)\s*(?P<unit>kg|g|ml|l|un|unidades|unidade)\b"
+UNITS = {
+    "kg": ("g", 1000), "g": ("g", 1),
+    "l": ("ml", 1000), "ml": ("ml", 1),
+    "un": ("un", 1), "unidade": ("un", 1), "unidades": ("un", 1),
+}
+
+
+def parse_quantity(names):
+    """
+    Quantity of each product name in grams, millilitres or units.
+
+    Returns:
+    - DataFrame with "quantity" (NaN when the name has none) and "dimension" ("g", "ml" or "un")
+    """
+    names = pd.Series(names)
+    # Product names repeat a lot between ETLs and supermarkets, so only the unique ones are parsed
+    codes, uniques = pd.factorize(names.astype(str).str.lower(), use_na_sentinel=False)
+    matches = pd.Series(uniques).str.extractall(QUANTITY_PATTERN).reset_index(level="match")
+    # A "pack x amount" match is the whole product (e.g. "café 250g fardo 12 x 250g"), so it wins over the first match
+    matches = matches.assign(single=matches["pack"].isna()).rename_axis("name").sort_values(["name","single","match"])
+    parts = matches[~matches.index.duplicated()].reindex(range(len(uniques))).iloc[codes].set_axis(names.index)
+
+    unit = parts["unit"]
+    amount = parts["amount"].str.replace(",", ".").astype(float)
+    pack = parts["pack"].astype(float).fillna(1)
+    factor = unit.map({key: value[1] for key, value in UNITS.items()}).astype(float)
+
+    return pd.DataFrame({
+        "quantity": pack * amount * factor,
+        "dimension": unit.map({key: value[0] for key, value in UNITS.items()}),
+    }, index=names.index)
+
+
+def normalize_prices(rows, catalog):
+    """Price of each row converted to the catalog unit of its item, when both quantities are known."""
+    found = parse_quantity(rows["name"])
+    reference = parse_quantity(np.asarray(catalog.to_units(rows["item"]), dtype=object))
+    reference.index = rows.index
+
+    comparable = (found["dimension"] == reference["dimension"]) & (found["quantity"] > 0)
+    ratio = (reference["quantity"] / found["quantity"]).where(comparable, 1.0)
+    return rows["price"] * ratio
+
+
+def reject_outliers(values, groups, filter=DEFAULT_FILTER):
+    """Boolean mask of the values far from the other values of their group."""
+    if filter not in FILTERS:
+        raise ValueError(f"Unknown filter {filter!r}, expected one of {FILTERS}")
+
+    grouped = values.groupby(groups)
+    enough = grouped.transform("size") >= MIN_ROWS
+
+    if filter == "mad":
+        deviation = (values - grouped.transform("median")).abs()
+        mad = deviation.groupby(groups).transform("median")
+        rejected = (mad > 0) & (deviation > MAD_THRESHOLD * 1.4826 * mad)
+    elif filter == "iqr":
+        q1 = groups.map(grouped.quantile(0.25))
+        q3 = groups.map(grouped.quantile(0.75))
+        spread = IQR_THRESHOLD * (q3 - q1)
+        rejected = (values < q1 - spread) | (values > q3 + spread)
+    else:
+        rejected = pd.Series(False, index=values.index)
+
+    return rejected & enough
+
+
+def aggregate(values, keys, method=DEFAULT_METHOD, trim=TRIM):
+    """Mean, median or trimmed mean of `values` per group of `keys` (a list of Series)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {list(METHODS)}")
+
+    if method == "trimmed":
+        frame = pd.DataFrame({f"key{i}": key for i, key in enumerate(keys)}).assign(value=values)
+        frame = frame.sort_values([*frame.columns[:-1], "value"])
+        grouped = frame.groupby(list(frame.columns[:-1]), sort=False)
+        position = grouped.cumcount()
+        cut = np.floor(grouped["value"].transform("size") * trim)
+        frame = frame[(position >= cut) & (position < grouped["value"].transform("size") - cut)]
+        result = frame.groupby(list(frame.columns[:-1]))["value"].mean()
+        result.index.names = [key.name for key in keys]
+        return result
+
+    return values.groupby(keys).agg(method)
+
+
+@dataclass
+class PriceEstimates:
+    """
+    Current prices of every item, overall and per supermarket.
+
+    `rows` holds the latest ETL rows with the normalized "unit_price" and the
+    "rejected" flag; `items` and `supermarkets` have "price", "n_rows" and
+    "n_rejected" per item and per (item, supermarket).
+    """
+    method: str
+    rows: pd.DataFrame
+    items: pd.DataFrame
+    supermarkets: pd.DataFrame
+
+    def price(self, item, supermarket=None):
+        table, key = (self.items, item) if supermarket is None else (self.supermarkets, (item, supermarket))
+        try:
+            return table.at[key, "price"]
+        except KeyError:
+            return np.nan
+
+    def item_rows(self, item):
+        return self.rows[self.rows["item"]==item]
+
+
+def compute_estimates(dataset, method=DEFAULT_METHOD, filter=DEFAULT_FILTER, normalize=True):
+    supermarket_df = dataset["supermarket_items"]
+    rows = supermarket_df[supermarket_df["ETL"]==latest_etl(dataset)].copy()
+
+    if normalize:
+        rows["unit_price"] = normalize_prices(rows, get_catalog(dataset["breakfast_id"]))
+    else:
+        rows["unit_price"] = rows["price"]
+    rows["rejected"] = reject_outliers(rows["unit_price"], rows["item"], filter)
+
+    kept = rows[~rows["rejected"]]
+    tables = []
+    for keys in [["item"], ["item","supermarket"]]:
+        counts = rows.groupby(keys)["rejected"].agg(n_rows="size", n_rejected="sum")
+        price = aggregate(kept["unit_price"], [kept[key] for key in keys], method).rename("price")
+        tables.append(counts.join(price))
+
+    return PriceEstimates(method=method, rows=rows, items=tables[0], supermarkets=tables[1])
+
+
+_estimates = VersionedCache("price_estimates", ["breakfast_id","supermarket_items"])
+
+
+def estimate_prices(dataset, method=DEFAULT_METHOD, filter=DEFAULT_FILTER, normalize=True):
+    """Price estimates of the latest ETL, computed once per dataset version and settings."""
+    return _estimates.get_or_compute(fingerprint(dataset), (method, filter, normalize),
+                                     lambda: compute_estimates(dataset, method, filter, normalize))
@@ -0,0 +1,88 @@
+"""
+Local recipe suggestions.
+
+Recipes are bundled in `data/recipes.json`, each ingredient optionally mapped to
+a catalog item with a quantity in item portions. An inverted index (item ->
+recipes) narrows the candidates to the recipes using the falling items, which
+are ranked by how many of those items they use and then by forecast cost.
+"""
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from breakfast.basket import basket_vectors, evaluate_baskets
+
+RECIPES_PATH = Path(__file__).resolve().parent.parent / "data" / "recipes.json"
+
+
+@dataclass
+class RankedRecipe:
+    recipe: dict
+    score: int
+    cost: float
+    future_cost: float
+
+    @property
+    def title(self):
+        return self.recipe["title"]
+
+
+def load_recipes(path=RECIPES_PATH):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+class RecipeIndex:
+
+    def __init__(self, recipes, matrix):
+        self.recipes = recipes
+        self.matrix = matrix
+
+        items = set(matrix.items)
+        baskets = [{ingredient["item"]: ingredient["quantity"] for ingredient in recipe["ingredients"]
+                    if ingredient["item"] in items} for recipe in recipes]
+
+        # (n_recipes, n_items) quantities, and the cost of every recipe today and at the last horizon
+        self.quantities = basket_vectors(baskets, matrix.items)
+        result = evaluate_baskets(matrix, self.quantities)
+        self.cost = result.current
+        self.future_cost = result.future
+
+        self.columns = {item: i for i, item in enumerate(matrix.items)}
+        self.postings = {item: np.flatnonzero(self.quantities[:, i] > 0) for item, i in self.columns.items()}
+
+    def rank(self, items, k=5):
+        """
+        Top `k` recipes for the given items (usually the ones with falling prices).
+
+        Recipes are ordered by the number of `items` they use and, on ties, by the
+        forecast cost. When fewer than `k` recipes use the items, the cheapest
+        remaining ones complete the list.
+        """
+        postings = [self.postings[item] for item in items if item in self.postings]
+        candidates = np.unique(np.concatenate(postings)) if postings else np.array([], dtype=int)
+
+        scores = np.zeros(len(self.recipes), dtype=int)
+        if len(candidates):
+            columns = [self.columns[item] for item in items if item in self.postings]
+            scores[candidates] = (self.quantities[np.ix_(candidates, columns)] > 0).sum(axis=1)
+
+        order = np.lexsort((self.future_cost, -scores))[:k]
+        return [RankedRecipe(self.recipes[i], int(scores[i]), float(self.cost[i]), float(self.future_cost[i])) for i in order]
+
+
+def recipe_markdown(ranked):
+    recipe = ranked.recipe
+    ingredients = "\n".join(f"- {ingredient['text']}" for ingredient in recipe["ingredients"])
+    steps = "\n".join(f"{i+1}. {step}" for i, step in enumerate(recipe["steps"]))
+
+    return (
+        f"**{recipe['title']}**\n\n"
+        f"*{recipe['description']}*\n\n"
+        f"**Ingredientes**\n\n{ingredients}\n\n"
+        f"**Modo de preparo**\n\n{steps}\n\n"
+        f"**Macronutrientes:** {recipe['macros']}\n\n"
+        f"**Custo estimado dos itens:** R$ {ranked.cost:,.2f} hoje, R$ {ranked.future_cost:,.2f} na previsão."
+    )
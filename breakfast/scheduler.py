@@ -0,0 +1,149 @@
+"""
+Concurrent computation of the independent sections of a page.
+
+Each rerun creates a `SectionScheduler` over a thread pool shared by every
+session. Tasks are submitted as soon as their inputs (widget values) are known,
+optionally after other tasks, and the page renders their results in order,
+showing placeholders meanwhile. When a rerun interrupts the page, `cancel`
+drops the tasks that haven't started yet. The run report compares the wall-clock time
+with the serial time (the sum of every task) and the critical path (the
+longest chain of dependent tasks, i.e. the best possible wall-clock time).
+"""
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+MAX_WORKERS = 8
+
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="sections")
+
+
+@dataclass
+class Task:
+    name: str
+    after: tuple
+    future: Future = field(default_factory=Future)
+    # Future of the pool job, once the task is queued
+    job: Future = None
+    start: float = None
+    end: float = None
+
+    @property
+    def duration(self):
+        return 0.0 if self.start is None or self.end is None else self.end - self.start
+
+
+@dataclass
+class RunReport:
+    wall: float
+    serial: float
+    critical_path: float
+    path: list
+    durations: dict
+
+    @property
+    def saved(self):
+        return self.serial - self.wall
+
+    def __str__(self):
+        return (f"wall {self.wall*1000:.0f} ms | serial {self.serial*1000:.0f} ms | "
+                f"critical path {self.critical_path*1000:.0f} ms ({' > '.join(self.path)})")
+
+
+class SectionScheduler:
+
+    def __init__(self, executor=executor, on_start=None, on_finish=None):
+        self.executor = executor
+        # Called in the worker thread before and after each task, e.g. to attach and detach the caller's context
+        self.on_start = on_start
+        self.on_finish = on_finish
+        # Reentrant: settling a future under the lock runs the callbacks of its dependents
+        self.lock = threading.RLock()
+        self.tasks = {}
+        self.cancelled = False
+        self.started = time.perf_counter()
+
+    def submit(self, name, function, *args, after=(), **kwargs):
+        """Run `function(*args, **kwargs)` on the pool once the tasks in `after` are done."""
+        if name in self.tasks:
+            raise ValueError(f"Task {name!r} was already submitted")
+        missing = [dependency for dependency in after if dependency not in self.tasks]
+        if missing:
+            raise ValueError(f"Task {name!r} depends on unknown tasks {missing}")
+
+        task = Task(name=name, after=tuple(after))
+        self.tasks[name] = task
+
+        dependencies = [self.tasks[dependency].future for dependency in after]
+        pending = [len(dependencies)]
+
+        def start(_=None):
+            with self.lock:
+                pending[0] -= 1
+                if pending[0] > 0:
+                    return
+                if self.cancelled or any(future.cancelled() for future in dependencies):
+                    task.future.cancel()
+                    return
+                failed = next((future for future in dependencies if future.exception() is not None), None)
+                if failed is not None:
+                    task.future.set_exception(failed.exception())
+                else:
+                    task.job = self.executor.submit(self._run, task, function, args, kwargs)
+
+        pending[0] += 1
+        for future in dependencies:
+            future.add_done_callback(start)
+        start()
+        return task.future
+
+    def _run(self, task, function, args, kwargs):
+        task.start = time.perf_counter()
+        try:
+            if self.on_start is not None:
+                self.on_start()
+            value = function(*args, **kwargs)
+        except BaseException as e:
+            task.end = time.perf_counter()
+            task.future.set_exception(e)
+        else:
+            task.end = time.perf_counter()
+            task.future.set_result(value)
+        finally:
+            if self.on_finish is not None:
+                self.on_finish()
+
+    def cancel(self):
+        """Drop the tasks that haven't started; the running ones finish but nothing new is queued."""
+        with self.lock:
+            self.cancelled = True
+            for task in self.tasks.values():
+                if task.job is None or task.job.cancel():
+                    task.future.cancel()
+
+    def result(self, name, timeout=None):
+        return self.tasks[name].future.result(timeout)
+
+    def report(self):
+        """Timings of the tasks finished so far."""
+        finished = {name: task for name, task in self.tasks.items() if task.end is not None}
+
+        longest = {}
+        def chain(name):
+            if name not in longest:
+                task = finished[name]
+                previous = max((chain(dependency) for dependency in task.after if dependency in finished),
+                               default=(0.0, []), key=lambda item: item[0])
+                longest[name] = (previous[0] + task.duration, previous[1] + [name])
+            return longest[name]
+
+        critical_path, path = max((chain(name) for name in finished), default=(0.0, []), key=lambda item: item[0])
+        end = max((task.end for task in finished.values()), default=self.started)
+        return RunReport(
+            wall=end - self.started,
+            serial=sum(task.duration for task in finished.values()),
+            critical_path=critical_path,
+            path=path,
+            durations={name: task.duration for name, task in finished.items()},
+        )
@@ -0,0 +1,206 @@
+"""
+Per-session memory accounting and idle-session eviction.
+
+Every run of a page touches the registry with its session state. The registry
+measures the bytes held by the session, widget values included (objects shared
+between sessions, such as the dataset, are not counted). It keeps no reference
+to the state: sessions are reached through Streamlit's session manager, and the
+ones Streamlit has closed are forgotten. Sessions idle for longer than
+`IDLE_TIMEOUT` have their state cleared, and when the sessions together hold
+more than `MAX_TOTAL_BYTES` the least recently used ones are cleared first. A
+cleared session starts over from the default widget values.
+"""
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from streamlit.runtime import Runtime
+
+IDLE_TIMEOUT = 30 * 60
+MAX_TOTAL_BYTES = 256 * 1024**2
+
+
+def nbytes(value, shared=frozenset(), seen=None):
+    """Approximate deep size of `value`, skipping the objects whose id is in `shared`."""
+    seen = set() if seen is None else seen
+    if id(value) in shared or id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(key, shared, seen) + nbytes(item, shared, seen) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(nbytes(item, shared, seen) for item in value)
+    return sys.getsizeof(value)
+
+
+def shared_ids(*objects):
+    """Ids of `objects` and of the values of the dicts among them (e.g. the dataset and its frames)."""
+    ids = set()
+    for value in objects:
+        ids.add(id(value))
+        if isinstance(value, dict):
+            ids.update(id(item) for item in value.values())
+    return frozenset(ids)
+
+
+def unwrap_state(state):
+    """
+    The long-lived `SessionState` behind `state`, and the lock of the current run.
+
+    `st.session_state` (and `ctx.session_state`) wrap the session's state for a
+    single run; the wrapped object lives as long as the session.
+    """
+    lock = nullcontext()
+    while hasattr(state, "_state"):
+        lock = getattr(state, "_lock", lock)
+        state = state._state
+    return state, lock
+
+
+def state_items(state):
+    """Every entry of a session state: user keys and widget values, keyless widgets included."""
+    state, lock = unwrap_state(state)
+    items = {}
+    with lock:
+        for key in list(state):
+            try:
+                items[key] = state[key]
+            except KeyError:
+                # A widget value kept for a widget that is gone
+                pass
+    return items
+
+
+def state_nbytes(state, shared=frozenset()):
+    return sum(nbytes(key, shared) + nbytes(value, shared) for key, value in state_items(state).items())
+
+
+class StreamlitSessions:
+    """The sessions of the running Streamlit server, through its session manager."""
+
+    @property
+    def manager(self):
+        try:
+            runtime = Runtime.instance()
+        except RuntimeError:
+            return None
+        # AppTest installs a mock runtime, without a session manager
+        return getattr(runtime, "_session_mgr", None)
+
+    @property
+    def available(self):
+        return self.manager is not None
+
+    def get(self, session_id):
+        """The `AppSession` of `session_id`, or None once Streamlit has closed it."""
+        info = self.manager.get_session_info(session_id)
+        return None if info is None else info.session
+
+    def clear(self, session, claim):
+        """
+        Clear the state of `session` when `claim(running)` allows it.
+
+        This runs on the server's event loop, where reruns are started, so no run can
+        start while the state is cleared; Streamlit clears it there too (clear cache).
+        """
+        def clear():
+            if claim(session._scriptrunner is not None):
+                session.session_state.clear()
+        session._event_loop.call_soon_threadsafe(clear)
+
+
+@dataclass
+class SessionInfo:
+    session_id: str
+    last_seen: float
+    nbytes: int
+    clearing: bool = False
+
+
+class SessionRegistry:
+
+    def __init__(self, idle_timeout=IDLE_TIMEOUT, max_total_bytes=MAX_TOTAL_BYTES, server=None):
+        self.idle_timeout = idle_timeout
+        self.max_total_bytes = max_total_bytes
+        self.server = StreamlitSessions() if server is None else server
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.evicted = 0
+
+    def touch(self, session_id, state, shared=frozenset()):
+        """Record a run of `session_id`, measure its state and evict the idle sessions."""
+        info = SessionInfo(session_id=session_id, last_seen=time.monotonic(), nbytes=state_nbytes(state, shared))
+        with self.lock:
+            self.sessions[session_id] = info
+        self.evict(keep=session_id)
+        return info
+
+    def evict(self, keep=None, now=None):
+        """
+        Clear the sessions idle for too long, then the least recently used ones while over the budget.
+
+        Returns:
+        - Ids of the sessions whose state is being cleared (asynchronously, on the server's event loop)
+        """
+        now = time.monotonic() if now is None else now
+        available = self.server.available
+        with self.lock:
+            if available:
+                for session_id in [session_id for session_id in self.sessions if self.server.get(session_id) is None]:
+                    del self.sessions[session_id]
+
+            candidates = sorted((info for info in self.sessions.values() if info.session_id != keep and not info.clearing),
+                                key=lambda info: info.last_seen)
+            total = sum(info.nbytes for info in self.sessions.values() if not info.clearing)
+            victims = []
+            for info in candidates:
+                if now - info.last_seen > self.idle_timeout or total > self.max_total_bytes:
+                    victims.append(info)
+                    total -= info.nbytes
+                    info.clearing = True
+
+        for info in victims:
+            session = self.server.get(info.session_id) if available else None
+            if session is None:
+                # Nothing to clear without a server (e.g. AppTest): the session is just forgotten
+                self._claim(info)
+            else:
+                self.server.clear(session, lambda running, info=info: self._claim(info, running))
+        return [info.session_id for info in victims]
+
+    def _claim(self, info, running=False):
+        """Drop `info` unless its session is running or ran since it was picked; True when its state may be cleared."""
+        with self.lock:
+            if self.sessions.get(info.session_id) is not info:
+                return False
+            if running:
+                info.clearing = False
+                return False
+            del self.sessions[info.session_id]
+            self.evicted += 1
+            return True
+
+    def total_bytes(self):
+        with self.lock:
+            return sum(info.nbytes for info in self.sessions.values())
+
+    def report(self):
+        now = time.monotonic()
+        with self.lock:
+            rows = [{"session": info.session_id, "bytes": info.nbytes, "idle_s": now - info.last_seen}
+                    for info in self.sessions.values()]
+        return pd.DataFrame(rows, columns=["session","bytes","idle_s"])
+
+
+registry = SessionRegistry()
@@ -0,0 +1,224 @@
+"""
+Persistent store of the results derived from the sheets.
+
+Results are pickled into an SQLite file, keyed by computation name, the version
+of the sheets the computation depends on, the revision of the code and item
+config that produced it, and a key (item, horizon, ...). After
+each new ETL `materialize` writes the default results once, so restarts and new
+sessions only pay indexed lookups instead of the whole pipeline. Results of
+older ETLs are pruned, keeping the last `KEEP_VERSIONS`.
+
+The file is `.cache/derived.sqlite` by default, or the path in the
+`BREAKFAST_STORE` environment variable. When it can't be opened the
+computations simply run in memory.
+"""
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from breakfast.catalog import CONFIG_PATH
+from breakfast.forecast import DEFAULT_HORIZON, PRICE_DEPENDENCIES, get_price_df, inflation_label, return_stats_df
+from breakfast.versioning import fingerprint
+
+STORE_ENV = "BREAKFAST_STORE"
+STORE_PATH = Path(__file__).resolve().parent.parent / ".cache" / "derived.sqlite"
+KEEP_VERSIONS = 3
+# Bump when a stored computation or its payload changes
+RESULTS_REVISION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    name TEXT NOT NULL,
+    version TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (name, version, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+CREATE TABLE IF NOT EXISTS materialized (
+    version TEXT PRIMARY KEY,
+    etl TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+# Sheets each computation depends on: the stored version is scoped to them
+COMPUTATIONS = {
+    "price_series": PRICE_DEPENDENCIES,
+    "stats": PRICE_DEPENDENCIES,
+    "price_split": PRICE_DEPENDENCIES,
+    "seasonality": ("breakfast_id","seasonality_forecast"),
+}
+
+
+class DerivedStore:
+
+    def __init__(self, path=None, config_path=CONFIG_PATH):
+        self._path = path
+        self.config_path = Path(config_path)
+        self._revision = None
+        self.lock = threading.RLock()
+        self._connection = None
+        self.disabled = False
+
+    @property
+    def path(self):
+        # Resolved when first used, so `BREAKFAST_STORE` can be set after the import
+        return Path(self._path or os.environ.get(STORE_ENV, STORE_PATH))
+
+    @property
+    def connection(self):
+        if self._connection is None and not self.disabled:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                self._connection = connection
+            except (OSError, sqlite3.Error) as e:
+                print(f"Derived store disabled ({self.path}): {e}")
+                self.disabled = True
+        return self._connection
+
+    @property
+    def revision(self):
+        """Digest of `RESULTS_REVISION` and the item config: results of other revisions are never read."""
+        if self._revision is None:
+            try:
+                config = self.config_path.read_bytes()
+            except OSError:
+                config = b""
+            self._revision = hashlib.blake2b(f"{RESULTS_REVISION}|".encode("utf-8") + config, digest_size=8).hexdigest()
+        return self._revision
+
+    def _scope(self, name, version):
+        return f"{self.revision}:{version.scope(COMPUTATIONS[name])}"
+
+    def _materialized_key(self, version):
+        return f"{self.revision}:{version.id}"
+
+    def get(self, name, version, key):
+        with self.lock:
+            if self.connection is None:
+                return None
+            row = self.connection.execute(
+                "SELECT payload FROM results WHERE name = ? AND version = ? AND key = ?",
+                (name, self._scope(name, version), json.dumps(key)),
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            # E.g. pickled by another pandas version: treated as a miss, so the entry is overwritten
+            print(f"Discarding stored {name} {key!r}: {e!r}")
+            return None
+
+    def put_many(self, name, version, values):
+        """Store a {key: value} dict of results in one transaction."""
+        rows = [(name, self._scope(name, version), json.dumps(key), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), time.time())
+                for key, value in values.items()]
+        with self.lock:
+            if self.connection is None:
+                return
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.executemany("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", rows)
+
+    def put(self, name, version, key, value):
+        self.put_many(name, version, {key: value})
+
+    def get_or_compute(self, name, version, key, compute):
+        value = self.get(name, version, key)
+        if value is None:
+            value = compute()
+            self.put(name, version, key, value)
+        return value
+
+    def is_materialized(self, version):
+        with self.lock:
+            if self.connection is None:
+                return False
+            return self.connection.execute("SELECT 1 FROM materialized WHERE version = ?",
+                                           (self._materialized_key(version),)).fetchone() is not None
+
+    def mark_materialized(self, version, started, keep=KEEP_VERSIONS):
+        """
+        Record `version` and drop the results written before the last `keep` versions.
+
+        Parameters:
+        - started: time.time() before the results of `version` were written, so they are kept
+        """
+        with self.lock:
+            if self.connection is None:
+                return
+            with self.connection:
+                self.connection.execute("BEGIN")
+                self.connection.execute("INSERT OR REPLACE INTO materialized VALUES (?, ?, ?)",
+                                        (self._materialized_key(version), version.etl, started))
+                oldest = self.connection.execute(
+                    "SELECT created_at FROM materialized ORDER BY created_at DESC LIMIT 1 OFFSET ?", (keep - 1,)
+                ).fetchone()
+                if oldest is not None:
+                    self.connection.execute("DELETE FROM results WHERE created_at < ?", oldest)
+                    self.connection.execute("DELETE FROM materialized WHERE created_at < ?", oldest)
+
+
+store = DerivedStore()
+
+
+def price_series(dataset, item, horizon=DEFAULT_HORIZON):
+    return store.get_or_compute("price_series", fingerprint(dataset), (item, horizon),
+                                lambda: get_price_df(dataset, item, horizon))
+
+
+def stats(dataset, catalog, horizon=DEFAULT_HORIZON):
+    return store.get_or_compute("stats", fingerprint(dataset), horizon,
+                                lambda: return_stats_df(dataset, catalog, horizon))
+
+
+def round_stats(stats_df, horizon=DEFAULT_HORIZON):
+    columns = ["Preço","Preço Previsão","Diferença %","Diferença R$",inflation_label(horizon)]
+    return stats_df.assign(**stats_df[columns].round(2))
+
+
+def split_stats(stats_df, horizon=DEFAULT_HORIZON):
+    """Rounded stats of the items whose price goes down and up over the horizon."""
+    stats_df = round_stats(stats_df, horizon)
+    return stats_df[stats_df["Diferença R$"]<0], stats_df[stats_df["Diferença R$"]>=0]
+
+
+def price_split(dataset, catalog, horizon=DEFAULT_HORIZON):
+    return store.get_or_compute("price_split", fingerprint(dataset), horizon,
+                                lambda: split_stats(stats(dataset, catalog, horizon), horizon))
+
+
+def seasonality_slice(dataset, id):
+    season_forecast = dataset["seasonality_forecast"]
+    return season_forecast[season_forecast["id"]==id][["id","ds","season"]].reset_index(drop=True)
+
+
+def seasonality(dataset, id):
+    return store.get_or_compute("seasonality", fingerprint(dataset), int(id), lambda: seasonality_slice(dataset, id))
+
+
+def materialize(dataset, catalog, horizon=DEFAULT_HORIZON):
+    """Write the default results of a new dataset version; a no-op when they are already stored."""
+    version = fingerprint(dataset)
+    if store.is_materialized(version):
+        return
+
+    started = time.time()
+    series = {item: get_price_df(dataset, item, horizon) for item in catalog.keys}
+    stats_df = return_stats_df(dataset, catalog, horizon, series)
+    store.put_many("price_series", version, {(item, horizon): series_forecast for item, series_forecast in series.items()})
+    store.put("stats", version, horizon, stats_df)
+    store.put("price_split", version, horizon, split_stats(stats_df, horizon))
+    store.put_many("seasonality", version, {int(id): seasonality_slice(dataset, id) for id in catalog.ids})
+    store.mark_materialized(version, started)
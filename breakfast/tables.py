@@ -0,0 +1,43 @@
+import pandas as pd
+
+PAGE_SIZE = 120
+
+
+def build_wide_tables(price_frames, catalog):
+    """
+    Inflation and price tables with one column per item, from the `get_price_df` frames.
+
+    Parameters:
+    - price_frames: dict of item key -> `get_price_df` result
+    - catalog: ItemCatalog used to name the columns
+
+    Returns:
+    - (inflation, price) DataFrames, with a "Data" column followed by one column per item
+    """
+    items = list(price_frames)
+    if not items:
+        empty = pd.DataFrame({"Data": []})
+        return empty, empty.copy()
+
+    long = pd.concat([frame[["ds","y","price"]] for frame in price_frames.values()], keys=items, names=["item", None])
+    wide = long.reset_index(level="item").pivot(index="ds", columns="item", values=["y","price"]).round(2)
+
+    dates = wide.index.strftime('%Y-%m')
+    columns = list(catalog.to_display(items))
+
+    tables = []
+    for metric in ["y","price"]:
+        table = pd.DataFrame(wide[metric].reindex(columns=items).to_numpy(), columns=columns)
+        table.insert(0, "Data", dates)
+        tables.append(table)
+    return tuple(tables)
+
+
+def paginate(df, page, page_size=PAGE_SIZE):
+    """Rows of the 1-based `page`, so long histories are sent to the browser a page at a time."""
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
+
+
+def n_pages(df, page_size=PAGE_SIZE):
+    return max(1, -(-len(df) // page_size))
@@ -0,0 +1,172 @@
+"""
+Dataset versions and cache invalidation.
+
+Every loaded dataset gets a content fingerprint: a hash over the ETL dates and
+the row hashes of each sheet (computed vectorized by pandas). Derived caches key
+their entries on the version of the sheets they depend on, and subscribe to the
+bus so a new version evicts exactly the caches whose sheets changed.
+"""
+import hashlib
+import threading
+import weakref
+from dataclasses import dataclass
+
+import pandas as pd
+
+# Frames are treated as immutable once loaded, so their hash and ETL dates are computed once
+_frame_values = {}
+
+
+def _digest(*parts):
+    return hashlib.blake2b("|".join(parts).encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _frame_value(df, name, compute):
+    key = id(df)
+    cached = _frame_values.get(key)
+    if cached is None or cached[0]() is not df:
+        cached = (weakref.ref(df, lambda _: _frame_values.pop(key, None)), {})
+        _frame_values[key] = cached
+    values = cached[1]
+    if name not in values:
+        values[name] = compute(df)
+    return values[name]
+
+
+def _hash_frame(df):
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.blake2b(rows.tobytes(), digest_size=8)
+    digest.update("|".join(map(str, df.columns)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def frame_fingerprint(df):
+    return _frame_value(df, "hash", _hash_frame)
+
+
+def etl_dates(df):
+    """The distinct ETL dates of the supermarket rows, joined in order."""
+    return _frame_value(df, "etl", lambda df: "|".join(sorted(map(str, df["ETL"].unique()))))
+
+
+@dataclass(frozen=True)
+class DatasetVersion:
+    id: str
+    etl: str
+    frames: tuple
+
+    @property
+    def pages(self):
+        return dict(self.frames)
+
+    def scope(self, pages):
+        """Version id restricted to `pages`: only changes when one of them changes."""
+        # The ETL dates come from "supermarket_items", whose content is already part of the
+        # scope when it is one of the pages
+        frames = self.pages
+        return _digest(*(f"{page}:{frames.get(page)}" for page in sorted(pages)))
+
+    def changed(self, other):
+        """Pages whose content differs from `other` (every page when there is no previous version)."""
+        if other is None:
+            return set(self.pages)
+        previous = other.pages
+        return {page for page, value in self.frames if previous.get(page) != value}
+
+
+def fingerprint(dataset):
+    etl = etl_dates(dataset["supermarket_items"])
+    frames = tuple((page, frame_fingerprint(df)) for page, df in dataset.items())
+    return DatasetVersion(id=_digest(etl, *(f"{page}:{value}" for page, value in frames)), etl=etl, frames=frames)
+
+
+class CacheBus:
+    """
+    Publish/subscribe channel for dataset versions.
+
+    Subscribers are registered by name (registering again replaces the previous
+    callback) with the pages they depend on, and are called with (old, new)
+    versions only when one of those pages changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.subscribers = {}
+
+    def subscribe(self, name, callback, depends_on=None):
+        with self.lock:
+            self.subscribers[name] = (callback, None if depends_on is None else set(depends_on))
+
+    def unsubscribe(self, name):
+        with self.lock:
+            self.subscribers.pop(name, None)
+
+    def publish(self, version):
+        with self.lock:
+            old = self.version
+            if old is not None and old.id == version.id:
+                return set()
+            self.version = version
+            changed = version.changed(old)
+            callbacks = [callback for callback, depends_on in self.subscribers.values()
+                         if depends_on is None or depends_on & changed]
+
+        for callback in callbacks:
+            callback(old, version)
+        return changed
+
+
+bus = CacheBus()
+
+
+class VersionedCache:
+    """
+    Cache of derived results keyed by the version of the pages they depend on.
+
+    Entries survive new versions that don't touch `depends_on`, and are evicted
+    when the bus publishes a version changing one of those pages.
+    """
+
+    def __init__(self, name, depends_on, bus=bus):
+        self.name = name
+        self.depends_on = tuple(depends_on)
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.bus = bus
+        bus.subscribe(name, self.evict, self.depends_on)
+
+    def scope(self, version):
+        return version.scope(self.depends_on)
+
+    def get(self, version, key, default=None):
+        return self.entries.get((self.scope(version), key), default)
+
+    def set(self, version, key, value):
+        with self.lock:
+            self.entries[(self.scope(version), key)] = value
+
+    def get_or_compute(self, version, key, compute):
+        scope = self.scope(version)
+        value = self.entries.get((scope, key))
+        if value is None:
+            with self.lock:
+                value = self.entries.get((scope, key))
+                if value is None:
+                    value = compute()
+                    self.entries[(scope, key)] = value
+        return value
+
+    def evict(self, old, new):
+        scope = self.scope(new)
+        with self.lock:
+            self.entries = {key: value for key, value in self.entries.items() if key[0] == scope}
+
+    def close(self):
+        """Stop listening to the bus and drop the entries."""
+        self.bus.unsubscribe(self.name)
+        with self.lock:
+            self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
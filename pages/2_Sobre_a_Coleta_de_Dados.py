@@ -1,6 +1,10 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from breakfast.catalog import get_catalog
+from breakfast.sessions import registry, shared_ids
 
 st.set_page_config(page_title="Previsão dos Itens do Café da Manhã",page_icon="📊",layout="wide")
 
@@ -38,48 +42,29 @@ Como os **catálogos variam entre supermercados e entre os próprios itens**, a
 
 st.markdown(text)
 
-@st.cache_resource
-def return_pretty_item(item,inverse=False):
-    
-    map_dict = {
-        "aveia":        "🌾 Aveia",
-        "banana":       "🍌 Banana",
-        "cafe":         "☕ Café",
-        "cuscuz":       "🍚 Cuscuz",
-        "iogurte":      "🥛 Iogurte",
-        "leite":        "🍼 Leite",
-        "mamao":        "🍈 Mamão",
-        "manteiga":     "🧈 Manteiga",
-        "margarina":    "🧈 Margarina",
-        "ovos":         "🥚 Ovos",
-        "pao frances":  "🥖 Pão Francês",
-        "queijo":       "🧀 Queijo"
-        }
-    
-    if inverse:
-        display_to_key = {v: k for k, v in map_dict.items()}
-        
-        return display_to_key.get(item,None)
-    
-    return map_dict.get(item,None)
-
 # Access the data from session_state
 if "dataset" in st.session_state:
     dataset = st.session_state["dataset"]
+    catalog = get_catalog(dataset["breakfast_id"])
+    
+    ctx = get_script_run_ctx()
+    if ctx is not None:
+        registry.touch(ctx.session_id,ctx.session_state,shared_ids(dataset))
     
-    supermarket_df = dataset["supermarket_items"].copy()
-    supermarket_df["item"] = supermarket_df["item"].apply(return_pretty_item)
+    # Only the counts are needed, so the shared sheet is never copied
+    supermarket_df = dataset["supermarket_items"]
+    by_supermarket = supermarket_df["supermarket"].value_counts().rename_axis("Supermercado").reset_index(name="count")
+    by_item = supermarket_df["item"].value_counts().rename_axis("Produto").reset_index(name="count")
+    by_item["Produto"] = catalog.to_display(by_item["Produto"])
     col = st.columns(2)
     
     with col[0]:
-        fig = px.pie(supermarket_df.rename(columns={"supermarket":"Supermercado"}),
-                     names="Supermercado",title="Distribuição por Supermercado")
+        fig = px.pie(by_supermarket,names="Supermercado",values="count",title="Distribuição por Supermercado")
         st.plotly_chart(fig, use_container_width=True)
         
     with col[1]:
         
-        fig = px.pie(supermarket_df.rename(columns={"item":"Produto"}),
-                     names="Produto",title="Distribuição por Produto")
+        fig = px.pie(by_item,names="Produto",values="count",title="Distribuição por Produto")
         st.plotly_chart(fig, use_container_width=True,key="item_pie")
         
     
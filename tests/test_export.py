@@ -0,0 +1,26 @@
+import io
+
+import pandas as pd
+import pytest
+from streamlit.runtime.download_data_util import convert_data_to_bytes_and_infer_mime
+
+from breakfast.catalog import get_catalog
+from breakfast.export import FORMATS, export_bytes
+from breakfast.loadtest import make_synthetic_dataset
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return make_synthetic_dataset(n_items=4)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_download_data_is_accepted_by_streamlit(dataset, fmt):
+    catalog = get_catalog(dataset["breakfast_id"])
+    # What the download button's callable returns on click, through Streamlit's converter
+    data = export_bytes("stats", dataset, catalog, fmt)
+
+    data_as_bytes, _ = convert_data_to_bytes_and_infer_mime(data, TypeError("unsupported"))
+
+    read = pd.read_csv if fmt == "csv" else pd.read_parquet
+    assert len(read(io.BytesIO(data_as_bytes))) == len(catalog.keys)
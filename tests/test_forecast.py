@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from breakfast import forecast
+from breakfast.data import latest_etl
+from breakfast.forecast import get_mean_price, get_price_df
+from breakfast.loadtest import make_synthetic_dataset
+
+
+def loop_price_df(dataset,item):
+    """The row-by-row compounding `get_price_df` used before it was vectorized."""
+    id_data = dataset["breakfast_id"]
+    id = id_data[id_data["item"]==item]["id"].values[0]
+
+    series_forecast = dataset["series_forecast"]
+    series_forecast = series_forecast[series_forecast["id"]==id].copy()
+    series_forecast["ds"] = pd.to_datetime(series_forecast["ds"])
+
+    date = latest_etl(dataset)
+    past_data = series_forecast[series_forecast["ds"]<date].reset_index(drop=True)
+    future_data = series_forecast[series_forecast["ds"]>=date].reset_index(drop=True)
+
+    past_data.loc[past_data.index[-1], 'price'] = get_mean_price(item,dataset)
+    present_index = len(past_data)
+
+    for i in range(len(past_data) - 2, -1, -1):
+        past_data.loc[i, 'price'] = past_data.loc[i + 1, 'price'] / (1 + past_data.loc[i + 1, 'y']/100)
+
+    past_data = pd.concat([past_data,future_data]).reset_index(drop=True)
+
+    for i in range(present_index,len(past_data)):
+        past_data.loc[i,"price"] = past_data.loc[i - 1, 'price'] * (1 + past_data.loc[i - 1, 'y']/100)
+
+    past_data.loc[past_data.index[present_index-1], 'price_lower'] = get_mean_price(item,dataset)
+    past_data.loc[past_data.index[present_index-1], 'price_upper'] = get_mean_price(item,dataset)
+
+    for i in range(present_index,len(past_data)):
+        past_data.loc[i,"price_lower"] = past_data.loc[i - 1, 'price_lower'] * (1 + past_data.loc[i - 1, 'y_lower']/100)
+        past_data.loc[i,"price_upper"] = past_data.loc[i - 1, 'price_upper'] * (1 + past_data.loc[i - 1, 'y_upper']/100)
+
+    return past_data
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return make_synthetic_dataset(n_future=6)
+
+
+def test_price_df_matches_loops(dataset):
+    for item in dataset["breakfast_id"]["item"]:
+        expected = loop_price_df(dataset,item)
+        result = get_price_df(dataset,item,6)
+
+        assert len(result) == len(expected)
+        for column in ["price","price_lower","price_upper"]:
+            np.testing.assert_allclose(result[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                       rtol=1e-9, err_msg=f"{item}: {column}")
+
+
+def test_price_df_without_forecast_rows(dataset):
+    # The forecast job lags the scrape: no forecast row at or after the latest ETL
+    dataset = dict(dataset, supermarket_items=dataset["supermarket_items"].assign(ETL="2031-01-01"))
+    item = dataset["breakfast_id"]["item"].iloc[0]
+
+    result = get_price_df(dataset,item,6)
+
+    assert pd.Timestamp(result["ds"].max()) < pd.Timestamp("2031-01-01")
+    np.testing.assert_allclose(result["price"].iloc[-1], get_mean_price(item,dataset))
+
+
+def test_extensions_follow_the_etl(dataset, monkeypatch):
+    item = dataset["breakfast_id"]["item"].iloc[0]
+    get_price_df(dataset,item,24)
+
+    # A new scrape two months later, with the same forecast sheet
+    etl = (pd.Timestamp(latest_etl(dataset)) + pd.DateOffset(months=2)).strftime("%Y-%m-%d")
+    scraped = dict(dataset, supermarket_items=dataset["supermarket_items"].assign(ETL=etl))
+    result = get_price_df(scraped,item,24)
+
+    monkeypatch.setattr(forecast, "extensions", forecast.HorizonExtensions())
+    expected = get_price_df(scraped,item,24)
+
+    for column in ["y","y_lower","y_upper","price"]:
+        np.testing.assert_allclose(result[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float),
+                                   rtol=1e-9, err_msg=column)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from breakfast.pricing import MIN_ROWS, aggregate, parse_quantity, reject_outliers
+
+
+def test_parse_quantity_units():
+    parsed = parse_quantity(["Leite 1L","Manteiga 200 g","Ovos 12 unidades","Azeite 0,5l"])
+
+    assert parsed["quantity"].tolist() == [1000.0, 200.0, 12.0, 500.0]
+    assert parsed["dimension"].tolist() == ["ml","g","un","ml"]
+
+
+def test_parse_quantity_prefers_pack():
+    parsed = parse_quantity(["Café 250g fardo 12 x 250g","Café 2 x 500g"])
+
+    assert parsed["quantity"].tolist() == [3000.0, 1000.0]
+
+
+def test_parse_quantity_missing_names():
+    parsed = parse_quantity(["Café 500g",None,"Pão","Leite 1L"])
+
+    assert parsed["quantity"].iloc[[0,3]].tolist() == [500.0, 1000.0]
+    assert parsed["quantity"].iloc[[1,2]].isna().all()
+    assert parsed["dimension"].iloc[[1,2]].isna().all()
+
+
+def test_parse_quantity_keeps_index():
+    names = pd.Series(["Café 500g","Café 500g","Leite 1L"], index=[10,20,30])
+
+    assert parse_quantity(names).index.tolist() == [10,20,30]
+
+
+@pytest.mark.parametrize("filter", ["mad","iqr"])
+def test_reject_outliers(filter):
+    values = pd.Series([10.0, 10.5, 9.5, 10.2, 9.8, 50.0, 5.0, 5.1, 4.9, 5.2, 5.0, 5.1])
+    groups = pd.Series(["a"]*6 + ["b"]*6)
+
+    rejected = reject_outliers(values, groups, filter)
+
+    assert rejected.tolist() == [False]*5 + [True] + [False]*6
+
+
+def test_reject_outliers_small_groups():
+    values = pd.Series([1.0, 1.0, 100.0][:MIN_ROWS - 1])
+    groups = pd.Series(["a"]*len(values))
+
+    assert not reject_outliers(values, groups, "mad").any()
+    assert not reject_outliers(values, groups, "iqr").any()
+
+
+def test_reject_outliers_none_and_unknown():
+    values = pd.Series([1.0, 1.0, 1.0, 100.0])
+    groups = pd.Series(["a"]*4)
+
+    assert not reject_outliers(values, groups, "none").any()
+    with pytest.raises(ValueError):
+        reject_outliers(values, groups, "zscore")
+
+
+def test_aggregate():
+    frame = pd.DataFrame({
+        "item": ["a"]*10 + ["b"]*3,
+        "value": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 100.0, 2.0, 4.0, 9.0],
+    })
+    keys = [frame["item"]]
+
+    assert aggregate(frame["value"], keys, "mean").to_dict() == pytest.approx({"a": 14.5, "b": 5.0})
+    assert aggregate(frame["value"], keys, "median").to_dict() == pytest.approx({"a": 5.5, "b": 4.0})
+    # 10% trimmed: one value off each end of "a", none of "b"
+    trimmed = aggregate(frame["value"], keys, "trimmed", trim=0.1)
+    assert trimmed.index.name == "item"
+    assert trimmed.to_dict() == pytest.approx({"a": np.mean(range(2, 10)), "b": 5.0})
+
+    with pytest.raises(ValueError):
+        aggregate(frame["value"], keys, "mode")
@@ -0,0 +1,102 @@
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+from breakfast.sessions import SessionRegistry, shared_ids, state_items, state_nbytes
+
+WIDGETS_SCRIPT = """
+import streamlit as st
+
+st.slider("Sem chave", 0, 10, 3)
+st.selectbox("Também sem chave", ["a", "b"])
+st.text_input("Com chave", key="named")
+st.session_state["values"] = list(range(100))
+"""
+
+
+class FakeSession:
+
+    def __init__(self, state, running=False):
+        self.session_state = state
+        self.running = running
+
+
+class FakeServer:
+    """Stand-in for the Streamlit session manager; clears right away instead of on the event loop."""
+
+    available = True
+
+    def __init__(self, **sessions):
+        self.sessions = sessions
+
+    def get(self, session_id):
+        return self.sessions.get(session_id)
+
+    def clear(self, session, claim):
+        if claim(session.running):
+            session.session_state.clear()
+
+
+def test_state_items_include_keyless_widgets():
+    at = AppTest.from_string(WIDGETS_SCRIPT).run()
+
+    items = state_items(at.session_state)
+
+    # Widgets are held by their ids, keyed ones included
+    assert {value for key, value in items.items() if key.startswith("$$ID-")} == {3, "a", ""}
+    assert items["values"] == list(range(100))
+
+
+def test_state_nbytes_skips_shared():
+    dataset = {"frame": np.zeros(1000)}
+    state = {"dataset": dataset, "own": np.zeros(10)}
+
+    assert state_nbytes(state, shared_ids(dataset)) < 1000
+    assert state_nbytes(state) > 8000
+
+
+def test_idle_sessions_are_cleared():
+    idle, current = {"x": 1}, {"y": 2}
+    registry = SessionRegistry(idle_timeout=60, server=FakeServer(idle=FakeSession(idle), current=FakeSession(current)))
+    registry.touch("idle", idle)
+    registry.touch("current", current)
+
+    evicted = registry.evict(keep="current", now=registry.sessions["idle"].last_seen + 120)
+
+    assert evicted == ["idle"]
+    assert idle == {} and current == {"y": 2}
+    assert list(registry.sessions) == ["current"]
+    assert registry.evicted == 1
+
+
+def test_running_sessions_are_not_cleared():
+    state = {"x": 1}
+    registry = SessionRegistry(idle_timeout=60, server=FakeServer(busy=FakeSession(state, running=True)))
+    registry.touch("busy", state)
+
+    registry.evict(now=registry.sessions["busy"].last_seen + 120)
+
+    assert state == {"x": 1}
+    assert not registry.sessions["busy"].clearing
+    assert registry.evicted == 0
+
+
+def test_sessions_over_budget_are_cleared_least_recent_first():
+    states = {name: {"values": np.zeros(1000)} for name in ["a","b","c"]}
+    registry = SessionRegistry(max_total_bytes=20_000, server=FakeServer(**{name: FakeSession(state) for name, state in states.items()}))
+    for name in ["a","b","c"]:
+        registry.touch(name, states[name])
+
+    assert states["a"] == {}
+    assert "values" in states["b"] and "values" in states["c"]
+    assert sorted(registry.sessions) == ["b","c"]
+
+
+def test_closed_sessions_are_forgotten():
+    server = FakeServer(gone=FakeSession({}), current=FakeSession({}))
+    registry = SessionRegistry(server=server)
+    registry.touch("gone", {"x": 1})
+    del server.sessions["gone"]
+
+    registry.touch("current", {})
+
+    assert list(registry.sessions) == ["current"]
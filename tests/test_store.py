@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from breakfast import store
+from breakfast.catalog import get_catalog
+from breakfast.forecast import get_price_df
+from breakfast.loadtest import make_synthetic_dataset
+from breakfast.versioning import fingerprint
+
+
+@pytest.fixture
+def derived(tmp_path, monkeypatch):
+    monkeypatch.setattr(store, "store", store.DerivedStore(tmp_path / "derived.sqlite"))
+    return store.store
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    return make_synthetic_dataset(n_items=4)
+
+
+def test_unreadable_payload_is_recomputed(derived, dataset):
+    version = fingerprint(dataset)
+    derived.connection.execute("INSERT INTO results VALUES (?, ?, ?, ?, ?)",
+                               ("stats", derived._scope("stats", version), "6", b"not a pickle", 0.0))
+
+    stats_df = store.stats(dataset, get_catalog(dataset["breakfast_id"]), 6)
+
+    assert len(stats_df) == 4
+    pd.testing.assert_frame_equal(derived.get("stats", version, 6), stats_df)
+
+
+def test_materialize_keeps_last_versions(derived):
+    for seed in range(store.KEEP_VERSIONS + 1):
+        dataset = make_synthetic_dataset(n_items=4, seed=seed)
+        store.materialize(dataset, get_catalog(dataset["breakfast_id"]))
+
+    assert derived.connection.execute("SELECT COUNT(*) FROM materialized").fetchone()[0] == store.KEEP_VERSIONS
+    assert derived.connection.execute("SELECT COUNT(DISTINCT version) FROM results WHERE name = 'stats'").fetchone()[0] == store.KEEP_VERSIONS
+    item = dataset["breakfast_id"]["item"].iloc[0]
+    pd.testing.assert_frame_equal(derived.get("price_series", fingerprint(dataset), (item, 6)), get_price_df(dataset, item, 6))